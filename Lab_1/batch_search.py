@@ -0,0 +1,109 @@
+import numpy as np
+from scipy import sparse
+from index import default_index
+from search import Search
+
+class BatchSearch:
+    """Пакетный поиск: разреженная матрица запросов умножается на
+    нормированную матрицу документ-термин (CSR), построенную один раз."""
+
+    def __init__(self, index=None):
+        self.index = index if index is not None else default_index
+        self.generation = None
+        self.build()
+
+    def build(self):
+        update_norms = getattr(self.index, "update_norms", None)
+        if update_norms is not None:
+            update_norms()  # у MappedIndex нормы уже в файле
+        self.doc_ids = np.array(self.index.doc_ids(), dtype=np.int64)
+        row_of = {doc_id: row for row, doc_id in enumerate(self.doc_ids)}
+        self.term_ids = {term: j for j, term in enumerate(self.index.vocabulary())}
+
+        rows, cols, weights = [], [], []
+        for term, j in self.term_ids.items():
+            idf = self.index.get_idf(term)
+            for doc_id, q in self.index.postings(term).items():
+                norm = self.index.get_norm(doc_id)
+                if norm == 0:
+                    continue  # такие документы search() тоже пропускает
+                rows.append(row_of[doc_id])
+                cols.append(j)
+                weights.append(q * idf / norm)
+        shape = (len(self.doc_ids), len(self.term_ids))
+        rows = np.array(rows, dtype=np.int64)
+        cols = np.array(cols, dtype=np.int64)
+        # веса q * idf / |d| и признак наличия термина в документе
+        self.weights = sparse.csr_matrix((np.array(weights, dtype=np.float64), (rows, cols)), shape=shape)
+        self.presence = sparse.csr_matrix((np.ones(len(rows)), (rows, cols)), shape=shape)
+        self.generation = self.index.generation
+
+    def query_matrix(self, searches):
+        # веса терминов те же, что у Search (с исправлением опечаток)
+        rows, cols, weights = [], [], []
+        for i, search in enumerate(searches):
+            for term, w in search.query_weights.items():
+                j = self.term_ids.get(term)
+                if j is not None:
+                    rows.append(i)
+                    cols.append(j)
+                    weights.append(w)
+        shape = (len(searches), len(self.term_ids))
+        return sparse.csr_matrix((np.array(weights, dtype=np.float64), (rows, cols)), shape=shape)
+
+    def search(self, queries, k=10):
+        """Top-k для каждого запроса: список пар (id документа, ранг).
+        При k=None возвращаются все найденные документы."""
+        if self.generation != self.index.generation:
+            self.build()
+        searches = [Search(query, self.index) for query in queries]
+        Q = self.query_matrix(searches)
+        # скалярные произведения и суммы квадратов весов совпавших терминов (= |запрос|^2)
+        products = (Q @ self.weights.T).tocsr()
+        matched = (Q.multiply(Q) @ self.presence.T).tocsr()
+        products.sort_indices()
+        matched.sort_indices()
+
+        results = []
+        for i, search in enumerate(searches):
+            start, end = matched.indptr[i], matched.indptr[i + 1]
+            rows = matched.indices[start:end]
+            squares = matched.data[start:end]
+            ranks = np.zeros(len(rows))
+            # нулевые произведения в CSR не хранятся — сопоставляем по номеру строки
+            p_start, p_end = products.indptr[i], products.indptr[i + 1]
+            p_rows = products.indices[p_start:p_end]
+            ranks[np.searchsorted(rows, p_rows)] = products.data[p_start:p_end]
+            ranks /= np.sqrt(squares)
+            if search.boolean is not None or search.phrases:
+                # булев фильтр и фразы проверяются так же, как в Search
+                rows, ranks = self.restrict(rows, ranks, search.get_candidates())
+            results.append(self.top(rows, ranks, k))
+        return results
+
+    def restrict(self, rows, ranks, candidates):
+        """Только документы candidates, как в Search; прошедшие фильтр без совпавших терминов — с рангом 0"""
+        if candidates is None:
+            return rows, ranks
+        allowed = np.searchsorted(self.doc_ids, np.array(sorted(candidates), dtype=np.int64))
+        keep = np.isin(rows, allowed)
+        rows, ranks = rows[keep], ranks[keep]
+        missing = np.setdiff1d(allowed, rows)
+        return np.concatenate([rows, missing]), np.concatenate([ranks, np.zeros(len(missing))])
+
+    def top(self, rows, ranks, k):
+        if k is not None and k <= 0:
+            return []  # как Search.search(0)
+        if k is not None and len(rows) > k:
+            # k-й по величине ранг; равные ему берём по возрастанию id, как search()
+            kth = np.partition(ranks, len(ranks) - k)[len(ranks) - k]
+            above = np.flatnonzero(ranks > kth)
+            ties = np.flatnonzero(ranks == kth)[:k - len(above)]
+            selected = np.concatenate([above, ties])
+            rows, ranks = rows[selected], ranks[selected]
+        order = np.lexsort((rows, -ranks))
+        return [(int(self.doc_ids[r]), float(s)) for r, s in zip(rows[order], ranks[order])]
+
+def batch_search(queries, k=10, index=None):
+    """Пакетный поиск по индексу (по умолчанию общему)"""
+    return BatchSearch(index).search(queries, k)
@@ -0,0 +1,209 @@
+"""Нагрузочные замеры поисковой системы на синтетическом корпусе.
+
+Пример: python benchmark.py --sizes 1000 10000 100000 --output bench.json
+Только токенизатор: python benchmark.py --sizes --tokenizer-mb 200
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import resource
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+from compressed_postings import CompressedPostings
+from file_loader import load_documents_from_folder
+from index import Index
+from search import Search
+from utils import STOP_WORDS, count_tokens, tokenize
+
+LETTERS = "abcdefghijklmnopqrstuvwxyz"
+
+def make_word(rank):
+    """Уникальное слово из латинских букв для ранга rank"""
+    letters = []
+    rank += 26 * 26  # не короче трёх букв
+    while rank:
+        rank, digit = divmod(rank, 26)
+        letters.append(LETTERS[digit])
+    word = "".join(reversed(letters))
+    return word + "q" if word in STOP_WORDS else word
+
+class ZipfCorpus:
+    """Генератор документов: частоты слов убывают по закону Ципфа"""
+
+    def __init__(self, vocabulary_size=50000, exponent=1.1, seed=0):
+        self.words = [make_word(rank) for rank in range(vocabulary_size)]
+        self.cum_weights = list(itertools.accumulate(1 / (rank + 1) ** exponent for rank in range(vocabulary_size)))
+        self.random = random.Random(seed)
+
+    def document(self, length):
+        return " ".join(self.random.choices(self.words, cum_weights=self.cum_weights, k=length))
+
+    def write(self, folder, count, mean_length=100):
+        """Запись count документов в папку; возвращает объём в байтах"""
+        total = 0
+        for i in range(count):
+            length = max(1, int(self.random.expovariate(1 / mean_length)))
+            text = self.document(length)
+            with open(os.path.join(folder, f"doc_{i:07d}.txt"), "w", encoding="utf-8") as f:
+                f.write(text)
+            total += len(text)
+        return total
+
+    def queries(self, count, seed=1):
+        """Фиксированный набор запросов из частых, средних и редких слов"""
+        rng = random.Random(seed)
+        bands = [self.words[:100], self.words[100:5000], self.words[5000:]]
+        queries = []
+        for _ in range(count):
+            terms = [rng.choice(rng.choice(bands) or self.words) for _ in range(rng.randint(1, 3))]
+            queries.append(" ".join(terms))
+        return queries
+
+def current_rss():
+    """Текущий RSS процесса в байтах (Linux), иначе пиковый"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return peak_rss()
+
+def peak_rss():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if platform.system() == "Darwin" else peak * 1024
+
+def percentiles(values, points=(50, 95, 99)):
+    values = sorted(values)
+    return {f"p{p}": values[min(len(values) - 1, int(len(values) * p / 100))] for p in points}
+
+def postings_report(index):
+    """Байт на запись и скорость декодирования: несжатые и сжатые списки"""
+    plain = [index.postings_lists[term_id] for term_id in index.term_ids.values()]
+    packed = [CompressedPostings.from_postings(doc_postings) for doc_postings in plain]
+    count = sum(len(doc_postings) for doc_postings in plain)
+    report = {"postings": count}
+    for name, lists, size in (("plain", plain, 8 * count),
+                              ("compressed", packed, sum(p.size_in_bytes() for p in packed))):
+        start = time.perf_counter()
+        for doc_postings in lists:
+            for _ in doc_postings.items():
+                pass
+        seconds = time.perf_counter() - start
+        report[name] = {
+            "bytes": size,
+            "bytes_per_posting": size / count,
+            "decode_postings_per_second": count / seconds,
+        }
+    return report
+
+def read_and_tokenize(path):
+    # прежний путь: весь файл в памяти, затем список токенов
+    with open(path, encoding="utf-8") as f:
+        return Counter(tokenize(f.read()))
+
+def stream_tokenize(path):
+    with open(path, encoding="utf-8") as f:
+        return count_tokens(f)
+
+def tokenizer_report(corpus, megabytes):
+    """Скорость и пиковая память токенизации одного большого файла: целиком и потоком"""
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "dump.txt")
+        size = 0
+        with open(path, "w", encoding="utf-8") as f:
+            while size < megabytes * 2 ** 20:
+                line = corpus.document(1000) + "\n"
+                f.write(line)
+                size += len(line)
+        report = {"file_bytes": size}
+        counts = {}
+        for name, function in (("read_all", read_and_tokenize), ("streaming", stream_tokenize)):
+            start = time.perf_counter()
+            counts[name] = function(path)
+            seconds = time.perf_counter() - start
+            tracemalloc.start()
+            function(path)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            report[name] = {"seconds": seconds, "mb_per_second": size / seconds / 2 ** 20, "peak_bytes": peak}
+        report["same_counts"] = counts["read_all"] == counts["streaming"]
+    return report
+
+def run_size(corpus, size, args):
+    with tempfile.TemporaryDirectory() as folder:
+        corpus_bytes = corpus.write(folder, size, args.doc_length)
+
+        index = Index(positional=args.positional)
+        index.cache = None  # меряем сам поиск, а не кэш
+        rss_before = current_rss()
+        start = time.perf_counter()
+        load_documents_from_folder(folder, args.workers, index)
+        load_seconds = time.perf_counter() - start
+        index.update_norms()
+        rss_after = current_rss()
+
+    queries = corpus.queries(args.queries)
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        Search(query, index).search(args.k)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    return {
+        "documents": size,
+        "corpus_bytes": corpus_bytes,
+        "terms": len(index.term_ids),
+        "load_seconds": load_seconds,
+        "load_docs_per_second": size / load_seconds,
+        "load_mb_per_second": corpus_bytes / load_seconds / 2 ** 20,
+        "index_rss_bytes": rss_after - rss_before,
+        "peak_rss_bytes": peak_rss(),
+        "search_ms": dict(percentiles(latencies), mean=sum(latencies) / len(latencies)),
+        "postings": postings_report(index),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark of the Lab_1 search engine")
+    parser.add_argument("--sizes", type=int, nargs="*", default=[1000, 10000, 100000],
+                        help="corpus sizes in documents (up to 10^6)")
+    parser.add_argument("--doc-length", type=int, default=100, help="mean document length in words")
+    parser.add_argument("--vocabulary", type=int, default=50000)
+    parser.add_argument("--exponent", type=float, default=1.1, help="Zipf exponent")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10, help="top-k per query (0 = full ranking)")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--positional", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--tokenizer-mb", type=float, default=0,
+                        help="also compare whole-file and streaming tokenizers on a file of this size")
+    parser.add_argument("--output", help="JSON file (default: stdout)")
+    args = parser.parse_args()
+    args.k = args.k or None
+
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "parameters": {key: value for key, value in vars(args).items() if key != "output"},
+        "runs": [],
+    }
+    for size in args.sizes:
+        # отдельный генератор на размер: корпус не зависит от предыдущих прогонов
+        corpus = ZipfCorpus(args.vocabulary, args.exponent, args.seed)
+        report["runs"].append(run_size(corpus, size, args))
+    if args.tokenizer_mb:
+        report["tokenizer"] = tokenizer_report(ZipfCorpus(args.vocabulary, args.exponent, args.seed), args.tokenizer_mb)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+import bisect
+import re
+from compressed_postings import CompressedPostings
+from utils import tokenize
+
+# ( ) "фраза"~N или отдельное слово; AND/OR/NOT — только заглавными
+LEXEME_PATTERN = re.compile(r'\(|\)|"[^"]*"(?:~\d+)?|[^\s()"]+')
+PHRASE_PATTERN = re.compile(r'"([^"]*)"(?:~(\d+))?')
+OPERATORS = {"AND", "OR", "NOT"}
+
+def is_boolean(query):
+    return any(lexeme in OPERATORS or lexeme in "()" for lexeme in LEXEME_PATTERN.findall(query))
+
+class QueryParser:
+    """Разбор булева запроса в дерево из кортежей:
+    ("term", t), ("phrase", термины, N), ("and", узлы), ("or", узлы), ("not", узел).
+    Соседние операнды без оператора соединяются через AND."""
+
+    def __init__(self, query):
+        self.lexemes = LEXEME_PATTERN.findall(query)
+        self.pos = 0
+
+    def peek(self):
+        return self.lexemes[self.pos] if self.pos < len(self.lexemes) else None
+
+    def take(self):
+        self.pos += 1
+        return self.lexemes[self.pos - 1]
+
+    def parse(self):
+        node = self.parse_or()
+        if self.peek() is not None:
+            raise ValueError(f"Unexpected '{self.peek()}' in query")
+        return node
+
+    def parse_or(self):
+        children = [self.parse_and()]
+        while self.peek() == "OR":
+            self.take()
+            children.append(self.parse_and())
+        return self.combine("or", children)
+
+    def parse_and(self):
+        children = [self.parse_not()]
+        while self.peek() not in (None, "OR", ")"):
+            if self.peek() == "AND":
+                self.take()
+            children.append(self.parse_not())
+        return self.combine("and", children)
+
+    def parse_not(self):
+        if self.peek() == "NOT":
+            self.take()
+            return ("not", self.parse_not())
+        return self.parse_atom()
+
+    def parse_atom(self):
+        lexeme = self.peek()
+        if lexeme is None or lexeme in (")", "AND", "OR"):
+            raise ValueError("Operand expected in query")
+        self.take()
+        if lexeme == "(":
+            node = self.parse_or()
+            if self.peek() != ")":
+                raise ValueError("Missing ')' in query")
+            self.take()
+            return node
+        if lexeme.startswith('"'):
+            text, distance = PHRASE_PATTERN.match(lexeme).groups()
+            terms = tuple(tokenize(text))
+            if len(terms) == 1:
+                return ("term", terms[0])
+            return ("phrase", terms, int(distance) if distance else None) if terms else ("and", ())
+        terms = tokenize(lexeme)
+        # слово может распасться на несколько токенов (например, "e-mail") или стать стоп-словом
+        return self.combine("and", [("term", term) for term in terms])
+
+    @staticmethod
+    def combine(operator, children):
+        children = [c for c in children if c != ("and", ())]
+        if len(children) == 1:
+            return children[0]
+        return (operator, tuple(children))
+
+def parse_query(query):
+    return QueryParser(query).parse()
+
+def positive_terms(node):
+    """Термины вне NOT — по ним ранжируются найденные документы"""
+    kind = node[0]
+    if kind == "term":
+        return [node[1]]
+    if kind == "phrase":
+        return list(node[1])
+    if kind == "not":
+        return []
+    return [term for child in node[1] for term in positive_terms(child)]
+
+def gallop(ids, value, low):
+    """Первая позиция >= low, где ids[i] >= value: экспоненциальный шаг, затем бинарный поиск"""
+    step = 1
+    high = low
+    while high < len(ids) and ids[high] < value:
+        low = high + 1
+        high += step
+        step *= 2
+    return bisect.bisect_left(ids, value, low, min(high, len(ids)))
+
+def posting_ids(postings):
+    """Отсортированные id списка документов; сжатый список не раскрывается:
+    intersect и difference пропускают его блоки по таблице пропусков"""
+    if isinstance(postings, CompressedPostings):
+        return postings
+    return getattr(postings, "ids", [])
+
+def as_ids(ids):
+    return ids.ids if isinstance(ids, CompressedPostings) else ids
+
+def intersect(a, b):
+    if len(a) > len(b):
+        a, b = b, a
+    if isinstance(b, CompressedPostings):
+        return b.select(a)
+    result = []
+    j = 0
+    for value in a:
+        j = gallop(b, value, j)
+        if j == len(b):
+            break
+        if b[j] == value:
+            result.append(value)
+    return result
+
+def difference(a, b):
+    if isinstance(b, CompressedPostings):
+        return b.select(a, keep=False)
+    result = []
+    j = 0
+    for value in a:
+        j = gallop(b, value, j)
+        if j == len(b) or b[j] != value:
+            result.append(value)
+    return result
+
+def union(a, b):
+    a, b = as_ids(a), as_ids(b)
+    result = []
+    i = j = 0
+    while i < len(a) and j < len(b):
+        if a[i] < b[j]:
+            result.append(a[i])
+            i += 1
+        elif a[i] > b[j]:
+            result.append(b[j])
+            j += 1
+        else:
+            result.append(a[i])
+            i += 1
+            j += 1
+    result.extend(a[i:])
+    result.extend(b[j:])
+    return result
+
+class BooleanEvaluator:
+    """Вычисление дерева запроса над отсортированными списками документов"""
+
+    def __init__(self, index, phrase_docs):
+        self.index = index
+        self.phrase_docs = phrase_docs  # (термины, N) -> отсортированные id документов с фразой
+        self.universe = None
+
+    def all_docs(self):
+        if self.universe is None:
+            self.universe = self.index.doc_ids()
+        return self.universe
+
+    def evaluate(self, node):
+        kind = node[0]
+        if kind == "term":
+            return posting_ids(self.index.postings(node[1]))
+        if kind == "phrase":
+            return self.phrase_docs(node[1], node[2])
+        if kind == "not":
+            return difference(self.all_docs(), self.evaluate(node[1]))
+        if kind == "or":
+            result = []
+            for child in node[1]:
+                result = union(result, self.evaluate(child))
+            return result
+        # AND: сначала пересекаем короткие списки, затем вычитаем отрицания
+        positive = [self.evaluate(c) for c in node[1] if c[0] != "not"]
+        negative = [self.evaluate(c[1]) for c in node[1] if c[0] == "not"]
+        if positive:
+            positive.sort(key=len)
+            result = positive[0]
+            for ids in positive[1:]:
+                if not result:
+                    break
+                result = intersect(result, ids)
+        else:
+            result = self.all_docs()
+        for ids in negative:
+            if not result:
+                break
+            result = difference(result, ids)
+        return result
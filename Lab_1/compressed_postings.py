@@ -0,0 +1,137 @@
+import bisect
+from array import array
+
+BLOCK_SIZE = 128  # пар (документ, частота) в блоке
+
+def encode_varbyte(values, data):
+    for value in values:
+        while value >= 0x80:
+            data.append(value & 0x7F | 0x80)
+            value >>= 7
+        data.append(value)
+
+def decode_varbyte(data, start, count):
+    """count чисел с позиции start; возвращает числа и позицию после них"""
+    values = []
+    value = shift = 0
+    pos = start
+    while len(values) < count:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+        else:
+            values.append(value)
+            value = shift = 0
+    return values, pos
+
+def compress_postings(ids, freqs):
+    """Сжатие: блоки по BLOCK_SIZE, в блоке разности id и частоты в variable-byte коде.
+    Возвращает данные и таблицу пропусков (последний id и смещение каждого блока)."""
+    data = bytearray()
+    last_ids, offsets = array("I"), array("I")
+    previous = 0
+    for start in range(0, len(ids), BLOCK_SIZE):
+        block = ids[start:start + BLOCK_SIZE]
+        offsets.append(len(data))
+        encode_varbyte((doc_id - prev for doc_id, prev in zip(block, [previous] + list(block[:-1]))), data)
+        encode_varbyte(freqs[start:start + BLOCK_SIZE], data)
+        previous = block[-1]
+        last_ids.append(previous)
+    return bytes(data), last_ids, offsets
+
+class CompressedPostings:
+    """Сжатый список документов термина с тем же интерфейсом чтения, что и Postings
+    (len, in, get, [], find, items, ids). Блоки декодируются по одному и только когда нужны;
+    для поиска документа нужный блок находится по таблице пропусков."""
+
+    __slots__ = ("data", "last_ids", "offsets", "count", "block_no", "block")
+
+    def __init__(self, data, last_ids, offsets, count):
+        self.data = data
+        self.last_ids = last_ids
+        self.offsets = offsets
+        self.count = count
+        self.block_no = -1  # последний декодированный блок
+        self.block = None
+
+    @classmethod
+    def from_postings(cls, postings):
+        data, last_ids, offsets = compress_postings(postings.ids, postings.freqs)
+        return cls(data, last_ids, offsets, len(postings))
+
+    def size_in_bytes(self):
+        return len(self.data) + 4 * (len(self.last_ids) + len(self.offsets))
+
+    def decode_block(self, n):
+        if n != self.block_no:
+            size = min(BLOCK_SIZE, self.count - n * BLOCK_SIZE)
+            deltas, pos = decode_varbyte(self.data, self.offsets[n], size)
+            freqs, _ = decode_varbyte(self.data, pos, size)
+            doc_id = self.last_ids[n - 1] if n else 0
+            ids = []
+            for delta in deltas:
+                doc_id += delta
+                ids.append(doc_id)
+            self.block_no, self.block = n, (ids, freqs)
+        return self.block
+
+    def __len__(self):
+        return self.count
+
+    def items(self):
+        for n in range(len(self.last_ids)):
+            ids, freqs = self.decode_block(n)
+            yield from zip(ids, freqs)
+
+    def __iter__(self):
+        return (doc_id for doc_id, _ in self.items())
+
+    @property
+    def ids(self):
+        """Все id (декодируются все блоки); для пересечений см. select"""
+        return array("I", iter(self))
+
+    def locate(self, doc_id, low=0):
+        """(блок, место в блоке) документа или None; блоки до low не просматриваются"""
+        n = bisect.bisect_left(self.last_ids, doc_id, low)
+        if n == len(self.last_ids):
+            return None
+        ids, _ = self.decode_block(n)
+        i = bisect.bisect_left(ids, doc_id)
+        if i < len(ids) and ids[i] == doc_id:
+            return n, i
+        return None
+
+    def find(self, doc_id):
+        """Место документа в списке или -1, как у Postings.find"""
+        found = self.locate(doc_id)
+        return -1 if found is None else found[0] * BLOCK_SIZE + found[1]
+
+    def select(self, ids, keep=True):
+        """Документы из отсортированного ids, которые есть в списке (keep=True) или которых нет.
+        Блок ищется по таблице пропусков, декодируются только блоки, где могут быть документы ids."""
+        result = []
+        n = 0
+        for doc_id in ids:
+            n = bisect.bisect_left(self.last_ids, doc_id, n)
+            found = n < len(self.last_ids) and self.locate(doc_id, n) is not None
+            if found == keep:
+                result.append(doc_id)
+        return result
+
+    def __contains__(self, doc_id):
+        return self.locate(doc_id) is not None
+
+    def get(self, doc_id, default=None):
+        found = self.locate(doc_id)
+        if found is None:
+            return default
+        return self.block[1][found[1]]
+
+    def __getitem__(self, doc_id):
+        found = self.locate(doc_id)
+        if found is None:
+            raise KeyError(doc_id)
+        return self.block[1][found[1]]
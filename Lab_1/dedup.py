@@ -0,0 +1,100 @@
+import zlib
+from collections import deque
+import numpy as np
+
+SHINGLE_SIZE = 5  # слов в шингле
+NUM_HASHES = 128  # длина подписи MinHash
+BANDS = 16  # полос LSH по NUM_HASHES // BANDS значений
+PRIME = 4294967311  # простое больше 2^32
+
+# хеш-функции (a * x + b) mod PRIME; a, b < 2^31, чтобы a * x + b помещалось в uint64
+_random = np.random.default_rng(20240611)
+HASH_A = _random.integers(1, 2 ** 31, NUM_HASHES, dtype=np.uint64)
+HASH_B = _random.integers(0, 2 ** 31, NUM_HASHES, dtype=np.uint64)
+
+def shingles(tokens, size=SHINGLE_SIZE):
+    """Номера (crc32) шинглов — последовательностей из size слов подряд.
+    tokens — список или поток: в памяти только окно из size слов."""
+    window = deque(maxlen=size)
+    found = set()
+    for token in tokens:
+        window.append(token)
+        if len(window) == size:
+            found.add(zlib.crc32(" ".join(window).encode("utf-8")))
+    if 0 < len(window) < size:
+        # документ короче шингла — один шингл из всех слов
+        found.add(zlib.crc32(" ".join(window).encode("utf-8")))
+    return found
+
+def minhash(tokens):
+    """Подпись MinHash: минимум каждой хеш-функции по шинглам документа.
+    Доля совпавших значений двух подписей оценивает меру Жаккара их шинглов."""
+    values = np.fromiter(shingles(tokens), dtype=np.uint64)
+    if not len(values):
+        return np.zeros(NUM_HASHES, dtype=np.uint32)
+    hashed = (HASH_A[:, None] * values[None, :] + HASH_B[:, None]) % PRIME
+    return hashed.min(axis=1).astype(np.uint32)
+
+class DuplicateDetector:
+    """Поиск почти одинаковых документов при загрузке: LSH по полосам подписей MinHash.
+    Документы с одинаковой полосой — кандидаты; дубликат — кандидат с оценкой
+    сходства не ниже threshold. Попарно документы не сравниваются.
+    mode="collapse" — копия не индексируется, а запоминается у оригинала;
+    mode="tag" — копия индексируется, но помечается ссылкой на оригинал."""
+
+    def __init__(self, mode="collapse", threshold=0.8):
+        if mode not in ("collapse", "tag"):
+            raise ValueError(f"Unknown duplicate mode: {mode}")
+        self.mode = mode
+        self.threshold = threshold
+        self.signatures = {}  # документ: подпись
+        self.buckets = [{} for _ in range(BANDS)]  # полоса: {байты полосы: документы}
+        self.duplicate_of = {}  # помеченная копия: оригинал (mode="tag")
+        self.copies = {}  # оригинал: пути свёрнутых копий (mode="collapse")
+
+    def copy(self):
+        other = DuplicateDetector(self.mode, self.threshold)
+        other.signatures = dict(self.signatures)
+        other.buckets = [{key: list(docs) for key, docs in bucket.items()} for bucket in self.buckets]
+        other.duplicate_of = dict(self.duplicate_of)
+        other.copies = {doc_id: list(paths) for doc_id, paths in self.copies.items()}
+        return other
+
+    @staticmethod
+    def bands(signature):
+        rows = NUM_HASHES // BANDS
+        return [signature[i * rows:(i + 1) * rows].tobytes() for i in range(BANDS)]
+
+    def find(self, signature):
+        """Оригинал, почти совпадающий с документом подписи signature, или None"""
+        best, best_similarity = None, self.threshold
+        seen = set()
+        for bucket, key in zip(self.buckets, self.bands(signature)):
+            for doc_id in bucket.get(key, ()):
+                if doc_id in seen:
+                    continue
+                seen.add(doc_id)
+                similarity = np.count_nonzero(self.signatures[doc_id] == signature) / NUM_HASHES
+                if similarity >= best_similarity:
+                    best, best_similarity = doc_id, similarity
+        return best
+
+    def add(self, doc_id, signature):
+        """Документ становится возможным оригиналом для следующих"""
+        self.signatures[doc_id] = signature
+        for bucket, key in zip(self.buckets, self.bands(signature)):
+            bucket.setdefault(key, []).append(doc_id)
+
+    def remove(self, doc_id):
+        """Забыть документ; возвращает пути его свёрнутых копий (их нужно загрузить заново)"""
+        self.duplicate_of.pop(doc_id, None)
+        for tagged in [c for c, original in self.duplicate_of.items() if original == doc_id]:
+            del self.duplicate_of[tagged]
+        signature = self.signatures.pop(doc_id, None)
+        if signature is not None:
+            for bucket, key in zip(self.buckets, self.bands(signature)):
+                docs = bucket[key]
+                docs.remove(doc_id)
+                if not docs:
+                    del bucket[key]
+        return self.copies.pop(doc_id, [])
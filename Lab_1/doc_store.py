@@ -0,0 +1,98 @@
+import mmap
+import tempfile
+import threading
+
+class DocumentStore:
+    """Тексты документов, дописанные подряд в один файл, и таблица смещений.
+    Читаются через mmap, поэтому в памяти процесса тексты не хранятся."""
+
+    def __init__(self, path=None):
+        # без пути — безымянный временный файл, удаляется при закрытии
+        self.file = open(path, "w+b") if path else tempfile.TemporaryFile()
+        self.entries = {}  # документ: (смещение, байт, символов)
+        self.size = 0
+        self.buffer = None
+        self.lock = threading.Lock()
+        self.write_lock = threading.Lock()  # дописывает один текст за раз (append или writer)
+
+    def append(self, doc_id, text):
+        data = text.encode("utf-8")
+        with self.write_lock, self.lock:
+            self.file.seek(self.size)
+            self.file.write(data)
+            self.entries[doc_id] = (self.size, len(data), len(text))
+            self.size += len(data)
+
+    def writer(self):
+        """Дописывание одного текста по кускам, пока его документ ещё не получил id"""
+        return StoreWriter(self)
+
+    def attach(self, doc_id, entry):
+        """Текст, записанный через writer, становится текстом документа doc_id"""
+        self.entries[doc_id] = entry
+
+    def remove(self, doc_id):
+        # место в файле не освобождается: файл только дописывается
+        self.entries.pop(doc_id, None)
+
+    def mapped(self, end):
+        if self.buffer is None or len(self.buffer) < end:
+            # файл вырос с прошлого отображения
+            self.file.flush()
+            if self.buffer is not None:
+                self.buffer.close()
+            self.buffer = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self.buffer
+
+    def read(self, doc_id, start=0, end=None):
+        """Текст документа или его часть [start:end] (в символах)"""
+        offset, size, length = self.entries[doc_id]
+        if size == 0:
+            return ""
+        with self.lock:
+            buffer = self.mapped(offset + size)
+            if size == length:
+                # ASCII: номера символов совпадают с номерами байтов, читаем только нужный кусок
+                end = length if end is None else min(end, length)
+                return buffer[offset + start:offset + max(start, end)].decode("ascii")
+            text = buffer[offset:offset + size].decode("utf-8")
+        return text[start:end]
+
+    def close(self):
+        with self.lock:
+            if self.buffer is not None:
+                self.buffer.close()
+                self.buffer = None
+            self.file.close()
+
+class StoreWriter:
+    """Текст, дописываемый в DocumentStore кусками; после закрытия entry — его запись для attach"""
+
+    def __init__(self, store):
+        self.store = store
+        store.write_lock.acquire()
+        self.offset = store.size
+        self.size = self.length = 0
+        self.entry = None
+
+    def write(self, text):
+        data = text.encode("utf-8")
+        with self.store.lock:
+            self.store.file.seek(self.offset + self.size)
+            self.store.file.write(data)
+        self.size += len(data)
+        self.length += len(text)
+
+    def close(self):
+        if self.entry is None:
+            self.entry = (self.offset, self.size, self.length)
+            with self.store.lock:
+                self.store.size = self.offset + self.size
+            self.store.write_lock.release()
+        return self.entry
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -1,35 +1,80 @@
-import math
-from collections import Counter, defaultdict
-from utils import tokenize
+import os
+from collections import Counter
+from index import default_index
+from positions import build_positions
+from utils import tokenize, tokenize_with_offsets
+
+def read_source(path):
+    """Текст исходного файла документа ("" — файла уже нет)"""
+    if not path or not os.path.exists(path):
+        return ""
+    with open(path, "rb") as f:
+        return f.read().decode("utf-8").replace("\r\n", "\n")  # как при загрузке папки
 
 class Document:
-    documents = {}
-    inverted_index = defaultdict(set) #Термин: Список документов с этим термином.
-    term_doc_freq = defaultdict(int) #Термин: Кол-во документов с этим термином.
+    __slots__ = ("documentID", "title", "path", "_text", "store", "tokens", "term_freq",
+                 "positions", "offsets", "first_hits", "term_ids", "length")
 
-    def __init__(self, doc_id, title, text):
+    def __init__(self, doc_id, title, text, path=None, term_freq=None, positions=None, offsets=None,
+                 first_hits=None):
         self.documentID = doc_id
         self.title = title
-        self.text = text
-        self.tokens = tokenize(text)
-        self.term_freq = Counter(self.tokens)
-
-    def add_to_base(self):
-        Document.documents[self.documentID] = self
-        for term in set(self.tokens):
-            Document.inverted_index[term].add(self.documentID)
-            Document.term_doc_freq[term] += 1
-
-    @staticmethod
-    def get_idf(term):
-        N = len(Document.documents)
-        Pi = Document.term_doc_freq.get(term, 0)
-        if Pi == 0:
-            return 0
-        return math.log(N / Pi) #Вес термина
-
-    def get_vector(self):
+        self.path = path
+        self._text = text
+        self.store = None  # DocumentStore, куда текст перенесён после индексации
+        if term_freq is None:
+            self.tokens = tokenize(text)
+            term_freq = Counter(self.tokens)
+        else:
+            self.tokens = None  # текст уже разобран (например, в другом процессе)
+        self.term_freq = term_freq
+        self.positions = positions
+        self.offsets = offsets
+        # термин: смещение его первого вхождения; после add_to_base — массив в порядке term_ids
+        self.first_hits = first_hits
+        # после add_to_base: номера терминов в индексе и кол-во токенов (term_freq и tokens удаляются)
+        self.term_ids = None
+        self.length = sum(term_freq.values())
+
+    @property
+    def text(self):
+        if self._text is None:
+            if self.store is not None:
+                return self.store.read(self.documentID)
+            return read_source(self.path)  # документ восстановлен из файла индекса
+        return self._text
+
+    def read_text(self, start, end):
+        """Часть текста [start:end]; из хранилища читается только она"""
+        if self._text is None:
+            if self.store is not None:
+                return self.store.read(self.documentID, start, end)
+            return read_source(self.path)[start:end]
+        return self._text[start:end]
+
+    def move_to_store(self, store):
+        if self._text is not None:  # иначе текст уже записан в хранилище при чтении файла
+            store.append(self.documentID, self._text)
+        self.store = store
+        self._text = None
+
+    def get_positions(self):
+        """Термин: сжатый список позиций в документе; заодно запоминает смещения токенов"""
+        if self.positions is None:
+            tokens, self.offsets = tokenize_with_offsets(self.text)
+            self.positions = build_positions(tokens)
+        return self.positions
+
+    def add_to_base(self, index=None):
+        if index is None:
+            index = default_index
+        index.add_document(self)
+
+    def get_vector(self, index=None):
+        if index is None:
+            index = default_index
+        terms = self.term_freq.items() if self.term_freq is not None else index.document_terms(self)
         vector = {}
-        for term, q in self.term_freq.items():
-            vector[term] = q * Document.get_idf(term)
+        for term, q in terms:
+            vector[term] = q * index.get_idf(term)
         return vector #Вектор документа
@@ -0,0 +1,127 @@
+"""Оценка ранжированного поиска: файлы qrels и run в формате TREC,
+метрики P@k, R@k, MAP, MRR и nDCG@k сразу для всех запросов на массивах NumPy.
+
+Пример: python evaluation.py qrels.txt run.txt -k 10
+"""
+import argparse
+import numpy as np
+from batch_search import batch_search
+
+METRICS = ("P@k", "R@k", "AP", "RR", "nDCG@k")
+
+def read_qrels(path):
+    """Строки «запрос 0 документ оценка» -> {запрос: {документ: оценка}}"""
+    qrels = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            fields = line.split()
+            if len(fields) != 4:
+                continue
+            qid, _, docno, grade = fields
+            qrels.setdefault(qid, {})[docno] = int(grade)
+    return qrels
+
+def write_qrels(path, qrels):
+    with open(path, "w", encoding="utf-8") as f:
+        for qid, grades in qrels.items():
+            for docno, grade in grades.items():
+                f.write(f"{qid} 0 {docno} {grade}\n")
+
+def read_run(path):
+    """Строки «запрос Q0 документ место ранг метка» -> {запрос: [(документ, ранг)]}
+    в порядке убывания ранга"""
+    run = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            fields = line.split()
+            if len(fields) != 6:
+                continue
+            qid, _, docno, _, score, _ = fields
+            run.setdefault(qid, []).append((docno, float(score)))
+    for ranking in run.values():
+        ranking.sort(key=lambda item: -item[1])
+    return run
+
+def write_run(path, run, tag="eyazis"):
+    with open(path, "w", encoding="utf-8") as f:
+        for qid, ranking in run.items():
+            for place, (docno, score) in enumerate(ranking, 1):
+                f.write(f"{qid} Q0 {docno} {place} {score:.6f} {tag}\n")
+
+def make_run(queries, k=1000, index=None):
+    """Прогон запросов {номер: текст} пакетным поиском; документы — их id строкой"""
+    qids = list(queries)
+    results = batch_search([queries[qid] for qid in qids], k, index)
+    return {qid: [(str(doc_id), rank) for doc_id, rank in ranking]
+            for qid, ranking in zip(qids, results)}
+
+def grade_matrix(run, qrels, qids):
+    """Оценки найденных документов в порядке выдачи (строка — запрос, 0 — нерелевантен
+    или места нет) и оценки всех релевантных документов по убыванию (для идеальной выдачи)"""
+    depth = max((len(run.get(qid, ())) for qid in qids), default=0)
+    grades = np.zeros((len(qids), max(depth, 1)))
+    ideal_depth = max((len(qrels[qid]) for qid in qids), default=0)
+    ideal = np.zeros((len(qids), max(ideal_depth, 1)))
+    for row, qid in enumerate(qids):
+        judged = qrels[qid]
+        ranking = run.get(qid, ())
+        grades[row, :len(ranking)] = [judged.get(docno, 0) for docno, _ in ranking]
+        best = sorted(judged.values(), reverse=True)
+        ideal[row, :len(best)] = best
+    return np.maximum(grades, 0), np.maximum(ideal, 0)
+
+def evaluate(run, qrels, k=10):
+    """Метрики по каждому запросу из qrels: (номера запросов, {метрика: массив значений}).
+    Запрос без выдачи получает нули."""
+    qids = sorted(qrels)
+    grades, ideal = grade_matrix(run, qrels, qids)
+    relevant = grades > 0
+    n_relevant = (ideal > 0).sum(axis=1)
+    has_relevant = np.maximum(n_relevant, 1)  # запросы без релевантных дают 0, а не деление на 0
+    places = np.arange(1, grades.shape[1] + 1)
+
+    top = relevant[:, :k].sum(axis=1)
+    hits = np.cumsum(relevant, axis=1)
+    ap = (relevant * hits / places).sum(axis=1) / has_relevant
+    first = np.where(relevant.any(axis=1), relevant.argmax(axis=1) + 1, np.inf)
+
+    # nDCG: выигрыш 2^оценка - 1 с логарифмической скидкой за место
+    discounts = 1 / np.log2(np.arange(2, k + 2))
+    dcg = ((2 ** grades[:, :k] - 1) * discounts[:grades[:, :k].shape[1]]).sum(axis=1)
+    idcg = ((2 ** ideal[:, :k] - 1) * discounts[:ideal[:, :k].shape[1]]).sum(axis=1)
+
+    table = {
+        "P@k": top / k,
+        "R@k": top / has_relevant,
+        "AP": ap,
+        "RR": 1 / first,
+        "nDCG@k": np.divide(dcg, idcg, out=np.zeros_like(dcg), where=idcg > 0),
+    }
+    return qids, table
+
+def aggregate(table):
+    """Средние по запросам; средние AP и RR — это MAP и MRR"""
+    names = {"AP": "MAP", "RR": "MRR"}
+    return {names.get(metric, metric): float(values.mean()) if len(values) else 0.0
+            for metric, values in table.items()}
+
+def format_table(qids, table, k=10):
+    header = ["query"] + [metric.replace("@k", f"@{k}") for metric in METRICS]
+    lines = ["\t".join(header)]
+    for row, qid in enumerate(qids):
+        lines.append("\t".join([qid] + [f"{table[metric][row]:.4f}" for metric in METRICS]))
+    for metric, value in aggregate(table).items():
+        lines.append(f"all\t{metric.replace('@k', f'@{k}')}\t{value:.4f}")
+    return "\n".join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description="Ranked evaluation of a TREC run against qrels")
+    parser.add_argument("qrels")
+    parser.add_argument("run")
+    parser.add_argument("-k", type=int, default=10, help="cutoff for P@k, R@k and nDCG@k")
+    args = parser.parse_args()
+    qids, table = evaluate(read_run(args.run), read_qrels(args.qrels), args.k)
+    print(format_table(qids, table, args.k))
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,189 @@
+import codecs
+import hashlib
 import os
+from collections import Counter
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from dedup import minhash
 from document import Document
+from index import default_index
+from positions import build_positions
+from utils import CHUNK_SIZE, count_tokens, iter_tokens, tokenize_with_offsets
 
-def load_documents_from_folder(folder_path):
-    """Загрузка всех .txt документов из указанной папки"""
+class FileText:
+    """Текст файла для iter_chunks: байты читаются кусками, по ним считается SHA-1,
+    прочитанный текст (\r\n -> \n) передаётся в sink — в хранилище или в список кусков"""
+
+    def __init__(self, file, sink):
+        self.file = file
+        self.sink = sink
+        self.sha1 = hashlib.sha1()
+        self.decoder = codecs.getincrementaldecoder("utf-8")()
+        self.carry = ""  # \r в конце куска: \n может прийти в следующем
+
+    def read(self, size):
+        text = ""
+        while not text:
+            data = self.file.read(size)
+            self.sha1.update(data)
+            text = self.carry + self.decoder.decode(data, final=not data)
+            self.carry = ""
+            if not data:
+                break
+            if text.endswith("\r"):
+                text, self.carry = text[:-1], "\r"
+        text = text.replace("\r\n", "\n")
+        self.sink(text)
+        return text
+
+def file_hash(filepath):
+    sha1 = hashlib.sha1()
+    with open(filepath, "rb") as f:
+        for data in iter(lambda: f.read(CHUNK_SIZE), b""):
+            sha1.update(data)
+    return sha1.hexdigest()
+
+def counted(tokens, counts):
+    for token in tokens:
+        counts[token] += 1
+        yield token
+
+def read_document(filepath, known_hash=None, positional=False, signature=False, store=None):
+    """Чтение и токенизация файла; выполняется и в дочерних процессах.
+    Если содержимое совпадает с known_hash, текст не разбирается.
+    При signature=True считается и подпись MinHash для поиска дубликатов.
+    Без позиций файл читается кусками: хеш, частоты и подпись считаются по кускам,
+    а при заданном store (DocumentStore) текст сразу дописывается в хранилище
+    и вместо текста возвращается его запись (смещение, байт, символов);
+    последним элементом возвращаются смещения первых вхождений терминов."""
+    if positional:
+        # смещениям токенов нужен весь текст
+        with open(filepath, "rb") as f:
+            data = f.read()
+        digest = hashlib.sha1(data).hexdigest()
+        if digest == known_hash:
+            return digest, None, None, None, None, None, None
+        text = data.decode("utf-8").replace("\r\n", "\n")
+        tokens, offsets = tokenize_with_offsets(text)
+        signature = minhash(tokens) if signature else None
+        return digest, text, Counter(tokens), build_positions(tokens), offsets, signature, None
+
+    if known_hash is not None and file_hash(filepath) == known_hash:
+        return known_hash, None, None, None, None, None, None
+    parts = []
+    first_hits = {}  # термин: смещение первого вхождения (для фрагментов без чтения всего текста)
+    with open(filepath, "rb") as f, (store.writer() if store is not None else nullcontext()) as writer:
+        stream = FileText(f, parts.append if writer is None else writer.write)
+        if signature:
+            term_freq = Counter()
+            signature = minhash(counted(iter_tokens(stream, first=first_hits), term_freq))
+        else:
+            term_freq, signature = count_tokens(stream, first=first_hits), None
+    text = "".join(parts) if writer is None else writer.entry
+    return stream.sha1.hexdigest(), text, term_freq, None, None, signature, first_hits
+
+def load_documents_from_folder(folder_path, workers=1, index=None):
+    """Загрузка всех .txt документов из указанной папки.
+    Повторная загрузка обрабатывает только новые, изменённые и удалённые файлы.
+    При workers > 1 файлы разбираются параллельно в пуле процессов."""
+    if index is None:
+        index = default_index
     if not os.path.exists(folder_path):
         raise FileNotFoundError(f"Folder not found: {folder_path}")
 
-    doc_id = 0
-    for filename in os.listdir(folder_path):
-        if filename.endswith(".txt"):
-            filepath = os.path.join(folder_path, filename)
-            with open(filepath, "r", encoding="utf-8") as f:
-                text = f.read()
-            doc = Document(doc_id, filename, text)
-            doc.add_to_base()
-            doc_id += 1
-    return doc_id  # количество загруженных документов
+    folder_path = os.path.abspath(folder_path)
+    filepaths = [os.path.join(folder_path, filename)
+                 for filename in sorted(os.listdir(folder_path)) if filename.endswith(".txt")]
+    found = set(filepaths)
+
+    # файлы, удалённые из папки с прошлой загрузки
+    orphans = []
+    for filepath in [p for p in index.manifest if os.path.dirname(p) == folder_path]:
+        if filepath not in found:
+            orphans.extend(forget_file(index, filepath))
+
+    pending = []  # (путь, stat, старая запись манифеста) в порядке имён файлов
+    for filepath in filepaths:
+        stat = os.stat(filepath)
+        entry = index.manifest.get(filepath)
+        if entry and entry["mtime"] == stat.st_mtime_ns and entry["size"] == stat.st_size:
+            continue  # файл не менялся — даже не читаем
+        pending.append((filepath, stat, entry))
+    orphans.extend(read_pending(index, pending, workers))
+
+    # копии, оставшиеся без оригинала, читаются ещё раз как новые файлы — из любой папки
+    while orphans:
+        paths = sorted({p for p in orphans if p not in index.manifest and os.path.exists(p)})
+        orphans = read_pending(index, [(p, os.stat(p), None) for p in paths], workers)
+    return len(found)  # количество документов папки в базе
+
+def read_pending(index, pending, workers):
+    paths = [filepath for filepath, _, _ in pending]
+    hashes = [entry["hash"] if entry else None for _, _, entry in pending]
+    positional = repeat(index.positional, len(pending))
+    signature = repeat(index.duplicates is not None, len(pending))
+    if workers > 1 and len(pending) > 1:
+        chunksize = max(1, len(pending) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # map сохраняет порядок файлов, поэтому id документов те же, что и без пула
+            parsed = pool.map(read_document, paths, hashes, positional, signature, chunksize=chunksize)
+            return add_parsed_documents(index, pending, parsed)
+    # в своём процессе текст пишется прямо в хранилище индекса, не собираясь в памяти
+    store = repeat(getattr(index, "store", None), len(pending))
+    return add_parsed_documents(index, pending, map(read_document, paths, hashes, positional, signature, store))
+
+def forget_file(index, filepath):
+    """Удаление файла из базы; возвращает пути свёрнутых копий, оставшихся без оригинала"""
+    entry = index.manifest.pop(filepath, None)
+    if entry is None:
+        return []  # копия, уже забытая вместе со своим оригиналом
+    original = entry.get("duplicate_of")
+    if original is not None:
+        # свёрнутая копия: в индексе её нет, только в списке копий оригинала
+        copies = index.duplicates.copies.get(original, [])
+        if filepath in copies:
+            copies.remove(filepath)
+        return []
+    orphans = index.remove_document(entry["doc_id"])
+    for path in orphans:
+        index.manifest.pop(path, None)
+    return orphans
+
+def add_parsed_documents(index, pending, parsed):
+    """Слияние разобранных файлов с базой в исходном порядке.
+    Возвращает пути копий, оставшихся без оригинала: их нужно прочитать ещё раз."""
+    orphans = []
+    for (filepath, stat, entry), (digest, text, term_freq, positions, offsets, signature, first_hits) in zip(
+            pending, parsed):
+        if text is None:
+            entry["mtime"], entry["size"] = stat.st_mtime_ns, stat.st_size
+            continue  # изменилась только дата
+        if entry:
+            orphans.extend(forget_file(index, filepath))
+
+        original = None if signature is None else index.duplicates.find(signature)
+        if original is not None and index.duplicates.mode == "collapse":
+            # почти полная копия уже проиндексированного документа: только запоминаем её
+            index.duplicates.copies.setdefault(original, []).append(filepath)
+            index.manifest[filepath] = {
+                "mtime": stat.st_mtime_ns, "size": stat.st_size, "hash": digest, "doc_id": None,
+                "duplicate_of": original
+            }
+            continue
+
+        stored = isinstance(text, tuple)  # текст уже в хранилище: там только его запись
+        doc = Document(index.next_id, os.path.basename(filepath), None if stored else text, filepath,
+                       term_freq, positions, offsets, first_hits)
+        if stored:
+            index.store.attach(doc.documentID, text)
+            doc.store = index.store
+        doc.add_to_base(index)
+        if original is not None:
+            index.duplicates.duplicate_of[doc.documentID] = original
+        elif signature is not None:
+            index.duplicates.add(doc.documentID, signature)
+        index.manifest[filepath] = {
+            "mtime": stat.st_mtime_ns, "size": stat.st_size, "hash": digest, "doc_id": doc.documentID
+        }
+    return orphans
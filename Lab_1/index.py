@@ -0,0 +1,237 @@
+import bisect
+import math
+from array import array
+from positions import decode_deltas
+from postings import Postings
+from query_cache import QueryCache
+from spelling import SpellingIndex
+
+class Index:
+    """Индекс коллекции документов; в процессе их может быть несколько.
+    Термины хранятся под целочисленными номерами, списки документов — в массивах."""
+
+    def __init__(self, positional=False, store=None, symspell=False, duplicates=None):
+        self.positional = positional #Хранить ли позиции терминов (для фраз).
+        self.store = store #DocumentStore для текстов документов (None — тексты в памяти).
+        self.documents = {}
+        self.term_ids = {} #Термин: его номер.
+        self.terms = [] #Номер: термин (None — номер свободен).
+        self.free_term_ids = [] #Номера удалённых терминов для повторного использования.
+        self.postings_lists = [] #Номер термина: Postings (документы с термином и частоты).
+        self.positions_lists = [] #Номер термина: сжатые списки позиций параллельно Postings.
+        self.doc_norms = {} #Документ: длина его вектора.
+        self.term_max_weight = array("d") #Номер термина: верхняя граница его вклада в ранг документа.
+        self.generation = 0 #Номер версии индекса: растёт при каждом добавлении и удалении.
+        self.norms_generation = -1 #Версия индекса, для которой посчитаны нормы.
+        self.next_id = 0 #Следующий свободный id документа.
+        self.manifest = {} #Путь к файлу: {mtime, size, hash, doc_id} загруженного документа.
+        self.global_stats = None #(N, {термин: df}) всей коллекции, если индекс — её шард.
+        self.cache = QueryCache() #Результаты частых запросов для текущей версии индекса.
+        self.sorted_terms = [] #Словарь по алфавиту (для автодополнения).
+        self.sorted_generation = -1 #Версия индекса, для которой отсортирован словарь.
+        self.spelling = SpellingIndex(symspell) #Триграммы (и удаления) терминов для исправления опечаток.
+        self.owned_terms = None #Номера терминов, чьи списки не общие со снимками индекса (None — все).
+        self.duplicates = duplicates #DuplicateDetector для почти одинаковых документов (None — без проверки).
+
+    def copy(self):
+        """Новая версия индекса для изменения, пока эта продолжает обслуживать поиск.
+        Списки документов общие, пока одна из версий не изменит их (copy-on-write)."""
+        self.update_norms()
+        other = Index(self.positional, self.store)
+        other.documents = dict(self.documents)
+        other.term_ids = dict(self.term_ids)
+        other.terms = list(self.terms)
+        other.free_term_ids = list(self.free_term_ids)
+        other.postings_lists = list(self.postings_lists)
+        other.positions_lists = list(self.positions_lists)
+        other.doc_norms = dict(self.doc_norms)
+        other.term_max_weight = self.term_max_weight
+        other.generation = other.norms_generation = self.generation
+        other.next_id = self.next_id
+        other.manifest = {path: dict(entry) for path, entry in self.manifest.items()}
+        other.global_stats = self.global_stats
+        other.spelling = self.spelling.copy()
+        other.duplicates = None if self.duplicates is None else self.duplicates.copy()
+        self.owned_terms, other.owned_terms = set(), set()
+        return other
+
+    def writable(self, term_id):
+        """Списки термина, которые можно менять: общие со снимком сначала копируются"""
+        if self.owned_terms is not None and term_id not in self.owned_terms:
+            self.postings_lists[term_id] = self.postings_lists[term_id].copy()
+            if self.positional:
+                self.positions_lists[term_id] = list(self.positions_lists[term_id])
+            self.owned_terms.add(term_id)
+        return self.postings_lists[term_id]
+
+    def intern(self, term):
+        term_id = self.term_ids.get(term)
+        if term_id is None:
+            if self.free_term_ids:
+                term_id = self.free_term_ids.pop()
+                self.terms[term_id] = term
+                self.postings_lists[term_id] = Postings()
+                self.positions_lists[term_id] = [] if self.positional else None
+            else:
+                term_id = len(self.terms)
+                self.terms.append(term)
+                self.postings_lists.append(Postings())
+                self.positions_lists.append([] if self.positional else None)
+            self.term_ids[term] = term_id
+            self.spelling.add(term)
+            if self.owned_terms is not None:
+                self.owned_terms.add(term_id)
+        return term_id
+
+    def add_document(self, doc):
+        doc_id = doc.documentID
+        self.documents[doc_id] = doc
+        positions = doc.get_positions() if self.positional else None
+        term_ids = []
+        for term, q in doc.term_freq.items():
+            term_id = self.intern(term)
+            i = self.writable(term_id).insert(doc_id, q)
+            if positions is not None:
+                self.positions_lists[term_id].insert(i, positions[term])
+            term_ids.append(term_id)
+        # после индексации документ хранит только номера своих терминов
+        doc.term_ids = array("I", term_ids)
+        if isinstance(doc.first_hits, dict):
+            doc.first_hits = array("I", (doc.first_hits.get(term, 0) for term in doc.term_freq))
+        doc.tokens = doc.term_freq = doc.positions = None
+        if self.store is not None:
+            doc.move_to_store(self.store)
+        self.next_id = max(self.next_id, doc_id + 1)
+        # индекс изменился: нормы пересчитаются при следующем обращении к get_norm
+        self.generation += 1
+
+    def remove_document(self, doc_id):
+        """Удаление документа; возвращает пути его свёрнутых дубликатов, оставшихся без оригинала"""
+        doc = self.documents.pop(doc_id)
+        if self.store is not None and self.owned_terms is None:
+            # у снимков индекса текст документа ещё может читаться
+            self.store.remove(doc_id)
+        for term_id in doc.term_ids:
+            postings = self.writable(term_id)
+            i = postings.find(doc_id)
+            postings.delete(i)
+            if self.positional:
+                del self.positions_lists[term_id][i]
+            if not postings:
+                del self.term_ids[self.terms[term_id]]
+                self.spelling.remove(self.terms[term_id])
+                self.terms[term_id] = None
+                self.postings_lists[term_id] = self.positions_lists[term_id] = None
+                self.free_term_ids.append(term_id)
+        self.doc_norms.pop(doc_id, None)
+        self.generation += 1
+        return [] if self.duplicates is None else self.duplicates.remove(doc_id)
+
+    def set_global_stats(self, N, doc_freq):
+        """IDF считается по статистике всей коллекции, а не только этого индекса"""
+        self.global_stats = (N, doc_freq)
+        self.generation += 1
+
+    def size(self):
+        return len(self.documents)
+
+    def doc_ids(self):
+        return sorted(self.documents)
+
+    def vocabulary(self):
+        return iter(self.term_ids)
+
+    def doc_freq(self, term):
+        term_id = self.term_ids.get(term)
+        return 0 if term_id is None else len(self.postings_lists[term_id])
+
+    def doc_freqs(self):
+        """Термин: кол-во документов с этим термином"""
+        return {term: len(self.postings_lists[term_id]) for term, term_id in self.term_ids.items()}
+
+    def sort_vocabulary(self):
+        """Словарь по алфавиту для complete, если с прошлого раза изменился индекс"""
+        if self.sorted_generation != self.generation:
+            self.sorted_terms = sorted(self.term_ids)
+            self.sorted_generation = self.generation
+        return self.sorted_terms
+
+    def complete(self, prefix, limit=10):
+        """Термины словаря, начинающиеся с prefix, по алфавиту"""
+        terms = self.sort_vocabulary()
+        i = bisect.bisect_left(terms, prefix)
+        result = []
+        while i < len(terms) and len(result) < limit and terms[i].startswith(prefix):
+            result.append(terms[i])
+            i += 1
+        return result
+
+    def suggest(self, term, limit=3):
+        """Ближайшие к term термины словаря: пары (термин, расстояние), сначала ближние и частые"""
+        found = self.spelling.lookup(term)
+        found.sort(key=lambda item: (item[1], -self.doc_freq(item[0]), item[0]))
+        return found[:limit]
+
+    def postings(self, term):
+        term_id = self.term_ids.get(term)
+        return {} if term_id is None else self.postings_lists[term_id]
+
+    def positions(self, term, doc_id):
+        """Позиции термина в документе (только для позиционного индекса)"""
+        term_id = self.term_ids[term]
+        i = self.postings_lists[term_id].find(doc_id)
+        return decode_deltas(self.positions_lists[term_id][i])
+
+    def document_terms(self, doc):
+        """Пары (термин, частота) проиндексированного документа"""
+        for term_id in doc.term_ids:
+            yield self.terms[term_id], self.postings_lists[term_id][doc.documentID]
+
+    def get_document(self, doc_id):
+        return self.documents[doc_id]
+
+    def get_idf(self, term):
+        if self.global_stats:
+            N, doc_freq = self.global_stats
+            Pi = doc_freq.get(term, 0)
+        else:
+            N, Pi = len(self.documents), self.doc_freq(term)
+        if Pi == 0:
+            return 0
+        return math.log(N / Pi) #Вес термина
+
+    def update_norms(self):
+        """Пересчёт норм всех документов, если с прошлого раза изменился индекс"""
+        if self.norms_generation == self.generation:
+            return
+        idf = [self.get_idf(term) if term is not None else 0 for term in self.terms]
+        squares = dict.fromkeys(self.documents, 0.0)
+        for term_id, postings in enumerate(self.postings_lists):
+            if postings:
+                weight = idf[term_id]
+                for doc_id, q in postings.items():
+                    squares[doc_id] += (q * weight) ** 2
+        self.doc_norms = {doc_id: math.sqrt(square) for doc_id, square in squares.items()}
+        # максимум q * idf / |d| по всем документам термина (для MaxScore)
+        self.term_max_weight = array("d", bytes(8 * len(self.terms)))
+        for term_id, postings in enumerate(self.postings_lists):
+            if postings:
+                best = 0
+                for doc_id, q in postings.items():
+                    norm = self.doc_norms[doc_id]
+                    if norm:
+                        best = max(best, q / norm)
+                self.term_max_weight[term_id] = best * idf[term_id]
+        self.norms_generation = self.generation
+
+    def get_norm(self, doc_id):
+        self.update_norms()
+        return self.doc_norms[doc_id]
+
+    def get_max_weight(self, term):
+        self.update_norms()
+        term_id = self.term_ids.get(term)
+        return 0 if term_id is None else self.term_max_weight[term_id]
+
+
+default_index = Index() # индекс по умолчанию для GUI и тестов
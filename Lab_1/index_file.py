@@ -0,0 +1,317 @@
+import bisect
+import json
+import math
+import mmap
+import os
+import struct
+import sys
+from array import array
+from collections import Counter
+import numpy as np
+from compressed_postings import CompressedPostings, compress_postings
+from dedup import DuplicateDetector
+from document import Document
+from index import Index, default_index
+from postings import Postings
+from query_cache import QueryCache
+
+# Формат файла (little-endian):
+#   заголовок | таблица терминов | таблица документов | строки | списки документов
+# Термины отсортированы, поэтому поиск термина — бинарный поиск прямо по mmap.
+# Версия 1: списки документов — массивы id и частот uint32.
+# Версия 2: сжатые списки — кол-во блоков, последние id и смещения блоков, данные блоков.
+MAGIC = b"EYZI"
+VERSION = 1
+COMPRESSED_VERSION = 2
+HEADER = struct.Struct("<4sIIIQQQQ")  # magic, версия, N, кол-во терминов, смещения секций
+TERM_ENTRY = struct.Struct("<QIIQd")   # строка (смещение, длина), df, postings, верхняя граница
+DOC_ENTRY = struct.Struct("<IIdQIQI")  # id, длина, норма, название (смещение, длина), путь (смещение, длина)
+
+INDEX_FILENAME = ".eyazis_index.bin"
+# Рядом с файлом индекса (path + MANIFEST_SUFFIX) — JSON с манифестом загруженных файлов,
+# следующим id и подписями дубликатов: по нему load_index восстанавливает обновляемый Index.
+MANIFEST_SUFFIX = ".manifest.json"
+
+
+def _to_bytes(values):
+    data = array("I", values)
+    if sys.byteorder != "little":
+        data.byteswap()
+    return data.tobytes()
+
+
+def _from_bytes(view):
+    """uint32 little-endian из файла: на little-endian машине — прямо из mmap, без копии"""
+    if sys.byteorder == "little":
+        return view.cast("I")
+    data = array("I", bytes(view))
+    data.byteswap()
+    return data
+
+
+def save_index(path, index=None, compressed=False):
+    """Сохранение индекса (по умолчанию общего) в бинарный файл;
+    compressed — списки документов в сжатом формате"""
+    if index is None:
+        index = default_index
+    index.update_norms()
+    terms = sorted(index.vocabulary())
+    doc_ids = sorted(index.documents)
+
+    strings = bytearray()
+    postings = bytearray()
+    term_table = bytearray()
+    for term in terms:
+        encoded = term.encode("utf-8")
+        doc_postings = index.postings(term)
+        term_table += TERM_ENTRY.pack(len(strings), len(encoded), len(doc_postings), len(postings),
+                                      index.get_max_weight(term))
+        strings += encoded
+        if compressed:
+            data, last_ids, offsets = compress_postings(doc_postings.ids, doc_postings.freqs)
+            postings += _to_bytes([len(last_ids)]) + _to_bytes(last_ids) + _to_bytes(offsets)
+            postings += data + bytes(-len(data) % 4)
+        else:
+            postings += _to_bytes(doc_postings.ids)
+            postings += _to_bytes(doc_postings.freqs)
+
+    doc_table = bytearray()
+    for doc_id in doc_ids:
+        doc = index.documents[doc_id]
+        title = doc.title.encode("utf-8")
+        source = (doc.path or "").encode("utf-8")
+        doc_table += DOC_ENTRY.pack(doc_id, doc.length, index.get_norm(doc_id),
+                                    len(strings), len(title), len(strings) + len(title), len(source))
+        strings += title + source
+    strings += bytes(-len(strings) % 4)  # выравнивание массивов uint32
+
+    terms_offset = HEADER.size
+    docs_offset = terms_offset + len(term_table)
+    strings_offset = docs_offset + len(doc_table)
+    postings_offset = strings_offset + len(strings)
+    header = HEADER.pack(MAGIC, COMPRESSED_VERSION if compressed else VERSION, len(doc_ids), len(terms),
+                         terms_offset, docs_offset, strings_offset, postings_offset)
+
+    # пишем во временный файл и подменяем: уже открытые mmap продолжают видеть старую версию
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        for part in (header, term_table, doc_table, strings, postings):
+            f.write(part)
+    os.replace(tmp_path, path)
+    save_manifest(path, index)
+
+
+def save_manifest(path, index):
+    """Манифест индекса, загруженного из папок, рядом с его файлом;
+    у индекса без манифеста (сегменты, MappedIndex) старый файл манифеста удаляется"""
+    manifest_path = path + MANIFEST_SUFFIX
+    if not getattr(index, "manifest", None):
+        if os.path.exists(manifest_path):
+            os.remove(manifest_path)
+        return
+    duplicates = index.duplicates
+    state = {
+        "positional": index.positional,
+        "next_id": index.next_id,
+        "manifest": index.manifest,
+        "duplicates": None if duplicates is None else {
+            "mode": duplicates.mode,
+            "threshold": duplicates.threshold,
+            "signatures": {doc_id: signature.tolist() for doc_id, signature in duplicates.signatures.items()},
+            "duplicate_of": duplicates.duplicate_of,
+            "copies": duplicates.copies,
+        },
+    }
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False)
+    os.replace(tmp_path, manifest_path)
+
+
+def load_index(path, store=None):
+    """Обновляемый Index из файла save_index и его манифеста: load_documents_from_folder
+    с ним перечитывает только новые и изменённые файлы. Документы заново не токенизируются —
+    частоты берутся из списков файла, тексты читаются из исходных файлов по запросу.
+    store — DocumentStore для текстов документов, загруженных после этого."""
+    with open(path + MANIFEST_SUFFIX, "r", encoding="utf-8") as f:
+        state = json.load(f)
+    if state["positional"]:
+        raise ValueError(f"Positions are not saved in the index file, reload the folders: {path}")
+    duplicates = None
+    if state["duplicates"] is not None:
+        saved = state["duplicates"]
+        duplicates = DuplicateDetector(saved["mode"], saved["threshold"])
+        for doc_id, signature in saved["signatures"].items():
+            duplicates.add(int(doc_id), np.array(signature, dtype=np.uint32))
+        # ключи JSON — строки
+        duplicates.duplicate_of = {int(doc_id): original for doc_id, original in saved["duplicate_of"].items()}
+        duplicates.copies = {int(doc_id): paths for doc_id, paths in saved["copies"].items()}
+
+    index = Index(duplicates=duplicates)
+    with MappedIndex(path) as mapped:
+        term_freqs = {doc_id: Counter() for doc_id in mapped.doc_ids()}
+        for term in mapped.vocabulary():
+            for doc_id, q in mapped.postings(term).items():
+                term_freqs[doc_id][term] = q
+        for doc_id, term_freq in term_freqs.items():
+            stored = mapped.get_document(doc_id)
+            Document(doc_id, stored.title, None, stored.path, term_freq).add_to_base(index)
+    index.store = store
+    index.manifest = state["manifest"]
+    index.next_id = state["next_id"]
+    return index
+
+
+class StoredDocument:
+    """Документ из файла индекса; текст читается с диска только по запросу"""
+
+    __slots__ = ("documentID", "title", "path", "length", "offsets")
+
+    def __init__(self, doc_id, title, path, length):
+        self.documentID = doc_id
+        self.title = title
+        self.path = path
+        self.length = length
+        self.offsets = None
+
+    @property
+    def text(self):
+        if not self.path or not os.path.exists(self.path):
+            return ""
+        with open(self.path, "r", encoding="utf-8") as f:
+            return f.read()
+
+    def read_text(self, start, end):
+        return self.text[start:end]
+
+
+class _TermKeys:
+    """Отсортированные термины файла как последовательность для bisect"""
+
+    def __init__(self, index):
+        self.index = index
+
+    def __len__(self):
+        return self.index.term_count
+
+    def __getitem__(self, i):
+        return self.index.term_bytes(i)
+
+
+class MappedIndex:
+    """Индекс, открытый через mmap: страницы файла разделяются между процессами"""
+
+    positional = False  # позиции терминов в файл не сохраняются
+    generation = 0  # файл не меняется
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        self.buffer = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, self.N, self.term_count, self.terms_offset, self.docs_offset,
+         self.strings_offset, self.postings_offset) = HEADER.unpack_from(self.buffer, 0)
+        if magic != MAGIC or version not in (VERSION, COMPRESSED_VERSION):
+            self.close()
+            raise ValueError(f"Not an index file: {path}")
+        self.compressed = version == COMPRESSED_VERSION
+        self.view = memoryview(self.buffer)
+        self.keys = _TermKeys(self)
+        self.cache = QueryCache()
+
+    def close(self):
+        self.view = None
+        self.buffer.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def size(self):
+        return self.N
+
+    def term_entry(self, i):
+        return TERM_ENTRY.unpack_from(self.buffer, self.terms_offset + i * TERM_ENTRY.size)
+
+    def term_bytes(self, i):
+        start, length = TERM_ENTRY.unpack_from(self.buffer, self.terms_offset + i * TERM_ENTRY.size)[:2]
+        start += self.strings_offset
+        return self.buffer[start:start + length]
+
+    def find_term(self, term):
+        key = term.encode("utf-8")
+        i = bisect.bisect_left(self.keys, key)
+        if i < self.term_count and self.term_bytes(i) == key:
+            return self.term_entry(i)
+        return None
+
+    def vocabulary(self):
+        return (self.term_bytes(i).decode("utf-8") for i in range(self.term_count))
+
+    def complete(self, prefix, limit=10):
+        """Термины, начинающиеся с prefix: в файле они уже отсортированы"""
+        key = prefix.encode("utf-8")
+        i = bisect.bisect_left(self.keys, key)
+        result = []
+        while i < self.term_count and len(result) < limit:
+            term = self.term_bytes(i)
+            if not term.startswith(key):
+                break
+            result.append(term.decode("utf-8"))
+            i += 1
+        return result
+
+    def postings(self, term):
+        entry = self.find_term(term)
+        if entry is None:
+            return {}
+        df, offset = entry[2], self.postings_offset + entry[3]
+        if self.compressed:
+            # блоки декодируются лениво прямо из страниц mmap
+            blocks = struct.unpack_from("<I", self.buffer, offset)[0]
+            last_ids = _from_bytes(self.view[offset + 4:offset + 4 + 4 * blocks])
+            offsets = _from_bytes(self.view[offset + 4 + 4 * blocks:offset + 4 + 8 * blocks])
+            return CompressedPostings(self.view[offset + 4 + 8 * blocks:], last_ids, offsets, df)
+        ids = _from_bytes(self.view[offset:offset + 4 * df])
+        freqs = _from_bytes(self.view[offset + 4 * df:offset + 8 * df])
+        return Postings(ids, freqs)
+
+    def get_idf(self, term):
+        entry = self.find_term(term)
+        if entry is None or entry[2] == 0:
+            return 0
+        return math.log(self.N / entry[2])
+
+    def get_max_weight(self, term):
+        entry = self.find_term(term)
+        return entry[4] if entry else 0
+
+    def doc_entry(self, doc_id):
+        lo, hi = 0, self.N
+        while lo < hi:
+            mid = (lo + hi) // 2
+            entry = DOC_ENTRY.unpack_from(self.buffer, self.docs_offset + mid * DOC_ENTRY.size)
+            if entry[0] < doc_id:
+                lo = mid + 1
+            elif entry[0] > doc_id:
+                hi = mid
+            else:
+                return entry
+        raise KeyError(doc_id)
+
+    def doc_ids(self):
+        return [DOC_ENTRY.unpack_from(self.buffer, self.docs_offset + i * DOC_ENTRY.size)[0]
+                for i in range(self.N)]
+
+    def get_norm(self, doc_id):
+        return self.doc_entry(doc_id)[2]
+
+    def get_document(self, doc_id):
+        _, length, _, title_start, title_len, path_start, path_len = self.doc_entry(doc_id)
+        title_start += self.strings_offset
+        path_start += self.strings_offset
+        title = self.buffer[title_start:title_start + title_len].decode("utf-8")
+        path = self.buffer[path_start:path_start + path_len].decode("utf-8")
+        return StoredDocument(doc_id, title, path or None, length)
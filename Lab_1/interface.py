@@ -1,8 +1,20 @@
+import os
+import queue
+import re
+import threading
 import tkinter as tk
 from tkinter import filedialog, messagebox, scrolledtext
+from dedup import DuplicateDetector
+from doc_store import DocumentStore
 from file_loader import load_documents_from_folder
-from search import Search
+from index import Index
+from index_file import INDEX_FILENAME, MappedIndex, save_index
+from search import Search, SearchCancelled
 
+RESULTS_PER_PAGE = 20  # сколько лучших документов показывать
+DEBOUNCE_MS = 250  # пауза в наборе, после которой запускается поиск
+RENDER_BATCH = 5  # результатов за один шаг вывода
+SUGGESTIONS = 8  # вариантов автодополнения
 
 
 class SearchGUI:
@@ -15,28 +27,121 @@ class SearchGUI:
         self.folder_label.pack()
         self.folder_button = tk.Button(self.root, text="Select Folder", command=self.select_folder)
         self.folder_button.pack()
+        self.workers_label = tk.Label(self.root, text="Indexing processes:")
+        self.workers_label.pack()
+        self.workers_spinbox = tk.Spinbox(self.root, from_=1, to=os.cpu_count() or 1, width=5)
+        self.workers_spinbox.pack()
+        self.positional_var = tk.BooleanVar(value=False)
+        self.positional_check = tk.Checkbutton(self.root, text="Phrase queries (positional index)",
+                                               variable=self.positional_var)
+        self.positional_check.pack()
+        self.duplicates_label = tk.Label(self.root, text="Near-duplicates:")
+        self.duplicates_label.pack()
+        self.duplicates_var = tk.StringVar(value="off")
+        self.duplicates_menu = tk.OptionMenu(self.root, self.duplicates_var, "off", "collapse", "tag")
+        self.duplicates_menu.pack()
+        self.save_index_button = tk.Button(self.root, text="Save Index", command=self.save_index)
+        self.save_index_button.pack()
+        self.open_index_button = tk.Button(self.root, text="Open Index", command=self.open_index)
+        self.open_index_button.pack()
 
         self.query_label = tk.Label(self.root, text="Enter search query:")
         self.query_label.pack()
         self.query_entry = tk.Entry(self.root, width=80)
         self.query_entry.pack()
+        self.query_entry.bind("<KeyRelease>", self.on_query_key)
+        self.suggestions = tk.Listbox(self.root, width=80, height=4)
+        self.suggestions.pack()
+        self.suggestions.bind("<<ListboxSelect>>", self.apply_suggestion)
+        self.incremental_var = tk.BooleanVar(value=True)
+        self.incremental_check = tk.Checkbutton(self.root, text="Search as you type",
+                                                variable=self.incremental_var)
+        self.incremental_check.pack()
         self.search_button = tk.Button(self.root, text="Search", command=self.perform_search)
         self.search_button.pack()
 
         self.results_box = scrolledtext.ScrolledText(self.root, width=100, height=20)
         self.results_box.pack()
+        self.results_box.tag_configure("match", background="yellow")
 
         # Для хранения всех запросов и результатов
         self.query_results = {}
+        # Индекс загруженных папок (тексты — в файле на диске) и текущий индекс поиска
+        self.base = Index(store=DocumentStore())
+        self.index = self.base
+        self.loading = False  # папка загружается в фоне
+        # Отложенный запуск поиска и номер последнего запроса
+        self.pending_search = None
+        self.search_number = 0
+        # один поток поиска: берёт из очереди только самый свежий запрос
+        self.search_queue = queue.Queue()
+        threading.Thread(target=self.search_worker, daemon=True).start()
 
         self.root.mainloop()
 
     def select_folder(self):
+        if self.loading:
+            messagebox.showwarning("Warning", "A folder is still loading")
+            return
         folder = filedialog.askdirectory()
         if folder:
             try:
-                count = load_documents_from_folder(folder)
-                messagebox.showinfo("Info", f"{count} documents loaded successfully!")
+                workers = int(self.workers_spinbox.get())
+            except ValueError as e:
+                messagebox.showerror("Error", str(e))
+                return
+            mode = self.duplicates_var.get()
+            current_mode = self.base.duplicates.mode if self.base.duplicates is not None else "off"
+            if self.positional_var.get() != self.base.positional or mode != current_mode:
+                # позиции и подписи нужны для всех документов — строим индекс заново
+                duplicates = DuplicateDetector(mode) if mode != "off" else None
+                generation = Index(positional=self.positional_var.get(), store=DocumentStore(),
+                                   duplicates=duplicates)
+            else:
+                # новая версия индекса; поиск пока идёт по текущей
+                generation = self.base.copy()
+            self.loading = True
+            self.folder_button.config(state=tk.DISABLED)
+            threading.Thread(target=self.load_folder, args=(folder, workers, generation), daemon=True).start()
+
+    def load_folder(self, folder, workers, generation):
+        try:
+            count = load_documents_from_folder(folder, workers, generation)
+            # нормы и словарь для автодополнения готовим здесь, а не в первом поиске или нажатии клавиши
+            generation.update_norms()
+            generation.sort_vocabulary()
+            result = count
+        except Exception as e:
+            result = e
+        self.root.after(0, self.publish_index, generation, result)
+
+    def publish_index(self, generation, result):
+        """Подмена индекса загруженной версией; уже начатые поиски дорабатывают на старой"""
+        self.loading = False
+        self.folder_button.config(state=tk.NORMAL)
+        if isinstance(result, Exception):
+            messagebox.showerror("Error", str(result))
+            return
+        self.base = self.index = generation
+        messagebox.showinfo("Info", f"{result} documents loaded successfully!")
+        if self.incremental_var.get() and self.query_entry.get().strip():
+            self.start_search()
+
+    def save_index(self):
+        path = filedialog.asksaveasfilename(initialfile=INDEX_FILENAME)
+        if path:
+            try:
+                save_index(path, self.base)
+                messagebox.showinfo("Info", f"Index saved: {path}")
+            except Exception as e:
+                messagebox.showerror("Error", str(e))
+
+    def open_index(self):
+        path = filedialog.askopenfilename()
+        if path:
+            try:
+                self.index = MappedIndex(path)
+                messagebox.showinfo("Info", f"{self.index.size()} documents opened successfully!")
             except Exception as e:
                 messagebox.showerror("Error", str(e))
 
@@ -45,17 +150,124 @@ class SearchGUI:
         if not query:
             messagebox.showwarning("Warning", "Please enter a query")
             return
+        self.start_search()
 
-        search = Search(query)
-        results = search.search()
-        self.results_box.delete("1.0", tk.END)
+    def on_query_key(self, event):
+        self.update_suggestions()
+        if not self.incremental_var.get():
+            return
+        # дебаунс: запрос уходит только после паузы в наборе
+        if self.pending_search is not None:
+            self.root.after_cancel(self.pending_search)
+        self.pending_search = self.root.after(DEBOUNCE_MS, self.start_search)
+
+    def start_search(self):
+        if self.pending_search is not None:
+            self.root.after_cancel(self.pending_search)
+            self.pending_search = None
+        query = self.query_entry.get().strip()
+        # новый запрос делает все предыдущие устаревшими
+        self.search_number += 1
+        if not query:
+            self.results_box.delete("1.0", tk.END)
+            return
+        self.search_queue.put((self.search_number, query, self.index))
 
+    def search_worker(self):
+        while True:
+            request = self.search_queue.get()
+            # запросы, набранные, пока считался предыдущий, кроме последнего, не нужны
+            while not self.search_queue.empty():
+                request = self.search_queue.get_nowait()
+            self.run_search(*request)
+
+    def run_search(self, number, query, index):
+        if number != self.search_number:
+            return
+        try:
+            search = Search(query, index)
+            search.cancelled = lambda: number != self.search_number
+            results = search.search(k=RESULTS_PER_PAGE)
+            for r in results:
+                if number != self.search_number:
+                    return  # пока считали, пользователь набрал новый запрос
+                r.build_snippet()  # фрагменты готовим здесь, а не в потоке интерфейса
+        except SearchCancelled:
+            return
+        except Exception as e:
+            results = e
+        self.root.after(0, self.show_results, number, results)
+
+    def show_results(self, number, results):
+        if number != self.search_number:
+            return
+        self.results_box.delete("1.0", tk.END)
+        if isinstance(results, Exception):
+            messagebox.showerror("Error", str(results))
+            return
         if not results:
             self.results_box.insert(tk.END, "No results found.\n")
             return
+        self.render_results(number, results, 0)
 
-        retrieved_ids = set()
-        for r in results:
+    def render_results(self, number, results, start):
+        """Вывод результатов небольшими порциями, чтобы окно не замирало"""
+        if number != self.search_number:
+            return
+        for r in results[start:start + RENDER_BATCH]:
             self.results_box.insert(tk.END, f"Title: {r.title}\nRank: {r.rank:.4f}\n")
-            self.results_box.insert(tk.END, f"Matched terms: {r.matched_terms}\nSnippet: {r.snippet}\n\n")
-            retrieved_ids.add(r.documentId)
\ No newline at end of file
+            self.results_box.insert(tk.END, self.duplicates_note(r.documentId))
+            self.results_box.insert(tk.END, f"Matched terms: {r.matched_terms}\nSnippet: ")
+            self.insert_snippet(r)
+            self.results_box.insert(tk.END, "\n\n")
+        if start + RENDER_BATCH < len(results):
+            self.root.after(1, self.render_results, number, results, start + RENDER_BATCH)
+
+    def duplicates_note(self, doc_id):
+        """Строка о почти одинаковых документах: оригинал помеченной копии или свёрнутые копии"""
+        duplicates = getattr(self.index, "duplicates", None)
+        if duplicates is None:
+            return ""
+        original = duplicates.duplicate_of.get(doc_id)
+        if original is not None:
+            return f"Near-duplicate of: {self.index.get_document(original).title}\n"
+        copies = duplicates.copies.get(doc_id)
+        if copies:
+            return f"Near-duplicates: {', '.join(os.path.basename(path) for path in copies)}\n"
+        return ""
+
+    def current_word(self):
+        query = self.query_entry.get()
+        word = re.search(r"[A-Za-z]*$", query).group()
+        return query, word
+
+    def update_suggestions(self):
+        """Автодополнение последнего слова запроса по словарю индекса"""
+        self.suggestions.delete(0, tk.END)
+        _, word = self.current_word()
+        if len(word) < 2:
+            return
+        for term in self.index.complete(word.lower(), SUGGESTIONS):
+            self.suggestions.insert(tk.END, term)
+
+    def apply_suggestion(self, event):
+        selection = self.suggestions.curselection()
+        if not selection:
+            return
+        query, word = self.current_word()
+        self.query_entry.delete(0, tk.END)
+        self.query_entry.insert(0, query[:len(query) - len(word)] + self.suggestions.get(selection[0]) + " ")
+        self.suggestions.delete(0, tk.END)
+        self.query_entry.focus_set()
+        if self.incremental_var.get():
+            self.start_search()
+
+    def insert_snippet(self, result):
+        """Вывод фрагмента с подсветкой совпавших терминов"""
+        snippet = result.snippet
+        position = 0
+        for start, end in result.highlights:
+            self.results_box.insert(tk.END, snippet[position:start])
+            self.results_box.insert(tk.END, snippet[start:end], "match")
+            position = end
+        self.results_box.insert(tk.END, snippet[position:])
\ No newline at end of file
@@ -0,0 +1,73 @@
+import heapq
+
+def encode_deltas(values):
+    """Сжатие возрастающей последовательности: разности в variable-byte коде"""
+    data = bytearray()
+    previous = 0
+    for value in values:
+        delta = value - previous
+        previous = value
+        while delta >= 0x80:
+            data.append(delta & 0x7F | 0x80)
+            delta >>= 7
+        data.append(delta)
+    return bytes(data)
+
+def decode_deltas(data):
+    values = []
+    value = shift = previous = 0
+    for byte in data:
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+            continue
+        previous += value
+        values.append(previous)
+        value = shift = 0
+    return values
+
+def build_positions(tokens):
+    """Термин: сжатый список его позиций в последовательности токенов"""
+    positions = {}
+    for i, term in enumerate(tokens):
+        positions.setdefault(term, []).append(i)
+    return {term: encode_deltas(values) for term, values in positions.items()}
+
+def phrase_match(position_lists):
+    """Есть ли позиция p, где термины фразы стоят подряд: p, p+1, ..."""
+    # слияние отсортированных списков со сдвигом на номер термина во фразе
+    pointers = [0] * len(position_lists)
+    start = position_lists[0][0]
+    while True:
+        aligned = True
+        for i, positions in enumerate(position_lists):
+            target = start + i
+            j = pointers[i]
+            while j < len(positions) and positions[j] < target:
+                j += 1
+            pointers[i] = j
+            if j == len(positions):
+                return False
+            if positions[j] != target:
+                start = positions[j] - i
+                aligned = False
+                break
+        if aligned:
+            return True
+
+def proximity_match(position_lists, distance):
+    """Встречаются ли все термины в окне, где между ними не больше distance других слов"""
+    # минимальное окно, содержащее хотя бы одну позицию каждого термина
+    heap = [(positions[0], i, 0) for i, positions in enumerate(position_lists)]
+    heapq.heapify(heap)
+    right = max(position for position, _, _ in heap)
+    limit = distance + len(position_lists) - 1
+    while True:
+        left, i, j = heapq.heappop(heap)
+        if right - left <= limit:
+            return True
+        if j + 1 == len(position_lists[i]):
+            return False
+        position = position_lists[i][j + 1]
+        right = max(right, position)
+        heapq.heappush(heap, (position, i, j + 1))
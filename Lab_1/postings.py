@@ -0,0 +1,58 @@
+import bisect
+from array import array
+
+class Postings:
+    """Список документов термина: отсортированные id и параллельные частоты.
+    Массивы — array('I') в памяти или срезы mmap для индекса на диске."""
+
+    __slots__ = ("ids", "freqs")
+
+    def __init__(self, ids=None, freqs=None):
+        self.ids = ids if ids is not None else array("I")
+        self.freqs = freqs if freqs is not None else array("I")
+
+    def copy(self):
+        return Postings(array("I", self.ids), array("I", self.freqs))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __iter__(self):
+        return iter(self.ids)
+
+    def __contains__(self, doc_id):
+        return self.find(doc_id) >= 0
+
+    def __getitem__(self, doc_id):
+        i = self.find(doc_id)
+        if i < 0:
+            raise KeyError(doc_id)
+        return self.freqs[i]
+
+    def find(self, doc_id):
+        i = bisect.bisect_left(self.ids, doc_id)
+        if i < len(self.ids) and self.ids[i] == doc_id:
+            return i
+        return -1
+
+    def get(self, doc_id, default=None):
+        i = self.find(doc_id)
+        return self.freqs[i] if i >= 0 else default
+
+    def items(self):
+        return zip(self.ids, self.freqs)
+
+    def insert(self, doc_id, q):
+        """Добавление документа; возвращает его место в списке"""
+        ids = self.ids
+        if not ids or ids[-1] < doc_id:
+            i = len(ids)  # обычный случай: id документов растут
+        else:
+            i = bisect.bisect_left(ids, doc_id)
+        ids.insert(i, doc_id)
+        self.freqs.insert(i, q)
+        return i
+
+    def delete(self, i):
+        del self.ids[i]
+        del self.freqs[i]
@@ -0,0 +1,74 @@
+import sys
+import threading
+from collections import OrderedDict
+
+class QueryCache:
+    """LRU-кэш результатов поиска, ограниченный числом записей и объёмом в байтах.
+    Записи действительны только для той версии индекса, на которой получены."""
+
+    def __init__(self, max_entries=1024, max_bytes=16 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # ключ: (результаты, размер)
+        self.bytes = 0
+        self.generation = None
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def entry_size(key, results):
+        size = sys.getsizeof(key) + sys.getsizeof(results)
+        for doc_id, rank, matched in results:
+            size += 3 * 32 + sys.getsizeof(matched)  # кортеж, id, ранг и список терминов
+        return size
+
+    def check_generation(self, generation):
+        if generation != self.generation:
+            # индекс изменился — все результаты устарели
+            self.entries.clear()
+            self.bytes = 0
+            self.generation = generation
+
+    def get(self, key, generation):
+        with self.lock:
+            self.check_generation(generation)
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, generation, results):
+        with self.lock:
+            self.check_generation(generation)
+            size = self.entry_size(key, results)
+            if size > self.max_bytes:
+                return
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old[1]
+            self.entries[key] = (results, size)
+            self.bytes += size
+            while len(self.entries) > self.max_entries or self.bytes > self.max_bytes:
+                _, (_, evicted_size) = self.entries.popitem(last=False)
+                self.bytes -= evicted_size
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        """Счётчики для мониторинга"""
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0,
+                "entries": len(self.entries),
+                "bytes": self.bytes,
+            }
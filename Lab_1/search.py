@@ -1,24 +1,106 @@
+import heapq
 import math
-from document import Document
+import re
+from boolean_query import BooleanEvaluator, as_ids, intersect, is_boolean, parse_query, posting_ids, positive_terms
+from index import default_index
+from positions import phrase_match, proximity_match
+from snippets import build_snippet
 from utils import tokenize
 
+# "точная фраза" или "слова рядом"~N (не дальше N слов друг от друга)
+PHRASE_PATTERN = re.compile(r'"([^"]*)"(?:~(\d+))?')
+
+class SearchCancelled(Exception):
+    """Запрос устарел (см. Search.cancelled), подсчёт прерван"""
+
 class SearchResult:
-    def __init__(self, document, rank, matched_terms):
+    __slots__ = ("documentId", "title", "rank", "matched_terms", "document", "index", "_snippet", "_highlights")
+
+    def __init__(self, document, rank, matched_terms, index=None):
         self.documentId = document.documentID
         self.title = document.title
         self.rank = rank
         self.matched_terms = matched_terms
-        self.snippet = document.text[:300]
+        self.document = document
+        self.index = index
+        self._snippet = None
+        self._highlights = None
+
+    def build_snippet(self):
+        # фрагмент строится только при первом обращении, т.е. для показанных результатов
+        if self._snippet is None:
+            self._snippet, self._highlights = build_snippet(self.document, self.matched_terms, self.index)
+
+    @property
+    def snippet(self):
+        self.build_snippet()
+        return self._snippet
+
+    @property
+    def highlights(self):
+        """Пары (начало, конец) совпавших терминов внутри snippet"""
+        self.build_snippet()
+        return self._highlights
+
+    def __getstate__(self):
+        # между процессами передаём готовый фрагмент, а не документ с индексом
+        self.build_snippet()
+        state = {name: getattr(self, name) for name in self.__slots__}
+        state["document"] = state["index"] = None
+        return state
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
 
 class Search:
-    def __init__(self, query):
+    def __init__(self, query, index=None, query_weights=None):
         self.query = query
+        # индекс: Index (по умолчанию общий) или открытый с диска MappedIndex
+        self.index = index if index is not None else default_index
         # токенизация запроса
         self.query_terms = tokenize(query)
+        self.phrases = []
+        # булев запрос: AND/OR/NOT и скобки; недописанный запрос ищется как обычный
+        self.boolean = None
+        if is_boolean(query):
+            try:
+                self.boolean = parse_query(query)
+            except ValueError:
+                pass
+        if self.boolean is not None:
+            # ранжируем по терминам вне NOT, фразы проверяются внутри дерева запроса
+            self.query_terms = positive_terms(self.boolean)
+        else:
+            for text, distance in PHRASE_PATTERN.findall(query):
+                terms = tokenize(text)
+                if terms:
+                    self.phrases.append((terms, int(distance) if distance else None))
+        # термин: его вес в векторе запроса (шард получает веса, посчитанные по всей коллекции)
+        self.query_weights = query_weights if query_weights is not None else self.get_query_weights()
+        # функция без аргументов: True — запрос устарел, подсчёт прерывается между терминами
+        self.cancelled = None
+
+    def get_query_weights(self):
+        """Вес 1 у терминов запроса; незнакомый термин (опечатка) заменяется
+        ближайшими терминами словаря с весом 1 / (1 + расстояние редактирования).
+        Булевы запросы не исправляются: в них важно точное совпадение."""
+        suggest = getattr(self.index, "suggest", None)
+        weights = {}
+        for term in self.query_terms:
+            if self.boolean is not None or suggest is None or self.index.doc_freq(term):
+                weights[term] = 1
+                continue
+            for candidate, distance in suggest(term):
+                weights[candidate] = max(weights.get(candidate, 0), 1 / (1 + distance))
+        return weights
 
+    def check_cancelled(self):
+        if self.cancelled is not None and self.cancelled():
+            raise SearchCancelled(self.query)
 
     def get_query_vector(self, doc_vector):
-        return {term: 1 for term in self.query_terms if term in doc_vector}
+        return {term: w for term, w in self.query_weights.items() if term in doc_vector}
 
     @staticmethod
     def scalar_product(a, b):
@@ -28,19 +110,165 @@ class Search:
     def norm(v):
         return math.sqrt(sum(x * x for x in v.values()))
 
-    def search(self):
-        results = []
+    def get_unique_terms(self):
+        return list(self.query_weights)
+
+    def phrase_in_document(self, terms, distance, doc_id):
+        position_lists = [self.index.positions(term, doc_id) for term in terms]
+        if distance is None:
+            return phrase_match(position_lists)
+        return proximity_match(position_lists, distance)
+
+    def phrase_docs(self, terms, distance):
+        """Отсортированные id документов, в которых выполнена фраза.
+        Без позиционного индекса фраза требует лишь наличия всех её слов."""
+        lists = sorted((posting_ids(self.index.postings(term)) for term in set(terms)), key=len)
+        docs = lists[0]
+        for ids in lists[1:]:
+            docs = intersect(docs, ids)
+        if len(terms) > 1 and getattr(self.index, "positional", False):
+            # позиции сливаются только для документов, где есть все слова фразы
+            docs = [d for d in docs if self.phrase_in_document(terms, distance, d)]
+        return as_ids(docs)
+
+    def get_candidates(self):
+        """Документы, прошедшие булев фильтр и все фразы запроса (None — ограничений нет)"""
+        if self.boolean is not None:
+            return set(BooleanEvaluator(self.index, self.phrase_docs).evaluate(self.boolean))
+        candidates = None
+        for terms, distance in self.phrases:
+            docs = set(self.phrase_docs(terms, distance))
+            candidates = docs if candidates is None else candidates & docs
+        return candidates
 
-        for doc in Document.documents.values():
-            doc_vector = doc.get_vector()
-            query_vector = self.get_query_vector(doc_vector)
-            if not query_vector:
+    @staticmethod
+    def restricted_items(postings, docs):
+        """Пары (документ, частота) только для документов из docs"""
+        if len(docs) < len(postings):
+            return ((doc_id, postings[doc_id]) for doc_id in docs if doc_id in postings)
+        return ((doc_id, q) for doc_id, q in postings.items() if doc_id in docs)
+
+    def score_terms(self, candidates=None):
+        """Term-at-a-time: обходим только списки документов терминов запроса"""
+        scores = {}   # документ: скалярное произведение с запросом
+        matched = {}  # документ: совпавшие термины
+        for term in self.get_unique_terms():
+            self.check_cancelled()
+            postings = self.index.postings(term)
+            if not postings:
+                continue
+            weight = self.index.get_idf(term) * self.query_weights[term]
+            items = postings.items() if candidates is None else self.restricted_items(postings, candidates)
+            for doc_id, q in items:
+                scores[doc_id] = scores.get(doc_id, 0) + q * weight
+                matched.setdefault(doc_id, []).append(term)
+        return scores, matched
+
+    def search_top(self, k):
+        """Top-k: ограниченная куча и отсечение документов по верхним границам вклада терминов (MaxScore)"""
+        query_terms = self.get_unique_terms()
+        terms = [term for term in query_terms if self.index.postings(term)]
+        candidates = self.get_candidates()
+        if k <= 0 or candidates == set() or (not terms and candidates is None):
+            return []
+        # термины с большим возможным вкладом обрабатываем первыми
+        terms.sort(key=self.index.get_max_weight, reverse=True)
+        # sum(w * max) / |w| <= sum(max) при любых весах запроса, так что граница годится и для них
+        rest = sum(self.index.get_max_weight(term) for term in terms)
+        query_norm = math.sqrt(sum(self.query_weights[term] ** 2 for term in terms))
+
+        scores = {}  # документ: скалярное произведение с запросом
+        squares = {}  # документ: сумма квадратов весов совпавших терминов
+        threshold = 0  # нижняя граница k-го лучшего ранга
+        for term in terms:
+            self.check_cancelled()
+            postings = self.index.postings(term)
+            w = self.query_weights[term]
+            weight = self.index.get_idf(term) * w
+            if len(scores) >= k and rest < threshold:
+                # новый документ уже не попадёт в топ: обновляем только найденные
+                items = self.restricted_items(postings, scores)
+            elif candidates is not None:
+                items = self.restricted_items(postings, candidates)
+            else:
+                items = postings.items()
+            for doc_id, q in items:
+                scores[doc_id] = scores.get(doc_id, 0) + q * weight
+                squares[doc_id] = squares.get(doc_id, 0) + w * w
+            rest -= self.index.get_max_weight(term)
+            if len(scores) >= k:
+                lower = (scores[d] / self.index.get_norm(d) for d in scores if self.index.get_norm(d))
+                best = heapq.nlargest(k, lower)
+                if len(best) == k:
+                    threshold = best[-1] / query_norm
+
+        heap = []  # (ранг, -документ): в корне худший из лучших
+        for doc_id, score in scores.items():
+            denominator = self.index.get_norm(doc_id) * math.sqrt(squares[doc_id])
+            if denominator == 0:
                 continue
-            numerator = self.scalar_product(doc_vector, query_vector)
-            denominator = self.norm(doc_vector) * self.norm(query_vector)
+            item = (score / denominator, -doc_id)
+            if len(heap) < k:
+                heapq.heappush(heap, item)
+            elif item > heap[0]:
+                heapq.heapreplace(heap, item)
+        if candidates is not None:
+            # документы, прошедшие фильтр только через NOT, получают ранг 0 (по возрастанию id)
+            for doc_id in sorted(candidates):
+                if doc_id in scores and self.index.get_norm(doc_id):
+                    continue
+                item = (0.0, -doc_id)
+                if len(heap) < k:
+                    heapq.heappush(heap, item)
+                elif item > heap[0]:
+                    heapq.heapreplace(heap, item)
+                else:
+                    break  # дальше id только больше
+
+        results = []
+        for rank, doc_id in sorted(heap, reverse=True):
+            doc_id = -doc_id
+            matched = [term for term in query_terms if doc_id in self.index.postings(term)]
+            results.append(SearchResult(self.index.get_document(doc_id), rank, matched, self.index))
+        return results
+
+    def cache_key(self, k):
+        # нормализованный запрос: термины с весами и фразы (порядок терминов влияет на matched_terms)
+        phrases = tuple((tuple(terms), d) for terms, d in self.phrases)
+        return tuple(self.query_weights.items()), phrases, self.boolean, k
+
+    def search(self, k=None):
+        """Поиск по запросу; при заданном k возвращаются только k лучших документов"""
+        cache = getattr(self.index, "cache", None)
+        if cache is None:
+            return self.evaluate(k)
+        key = self.cache_key(k)
+        generation = self.index.generation
+        cached = cache.get(key, generation)
+        if cached is None:
+            results = self.evaluate(k)
+            cache.put(key, generation, [(r.documentId, r.rank, tuple(r.matched_terms)) for r in results])
+            return results
+        return [SearchResult(self.index.get_document(doc_id), rank, list(matched), self.index)
+                for doc_id, rank, matched in cached]
+
+    def evaluate(self, k=None):
+        if k is not None:
+            return self.search_top(k)
+        results = []
+        candidates = self.get_candidates()
+        scores, matched = self.score_terms(candidates)
+
+        for doc_id in sorted(scores.keys() | (candidates or set())):
+            # вектор запроса — веса совпавших терминов
+            query_norm = math.sqrt(sum(self.query_weights[term] ** 2 for term in matched.get(doc_id, ())))
+            denominator = self.index.get_norm(doc_id) * query_norm
             if denominator == 0:
+                if candidates is None:
+                    continue
+                # документ прошёл фильтр только через NOT: ранг 0
+                results.append(SearchResult(self.index.get_document(doc_id), 0.0, matched.get(doc_id, []), self.index))
                 continue
-            rank = numerator / denominator
-            matched = list(query_vector.keys())
-            results.append(SearchResult(doc, rank, matched))
+            rank = scores[doc_id] / denominator
+            results.append(SearchResult(self.index.get_document(doc_id), rank, matched[doc_id], self.index))
         return sorted(results, key=lambda x: x.rank, reverse=True)
@@ -0,0 +1,415 @@
+import heapq
+import math
+import os
+import shutil
+import tempfile
+import threading
+import numpy as np
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from index import Index
+from index_file import MappedIndex, save_index
+from search import Search, SearchResult
+
+BUFFER_DOCS = 1000  # документов в буфере, после которых он становится сегментом
+MERGE_FACTOR = 4  # столько соседних сегментов одного яруса сливаются в один
+SEGMENT_SUFFIX = ".seg"
+OPEN_SEGMENTS = 64  # открытых файлов сегментов на процесс поиска
+
+class Segment:
+    """Неизменяемая часть индекса: Index в памяти (ещё не записан) или MappedIndex на диске.
+    Нормы из самого сегмента не используются: они посчитаны по его собственной статистике."""
+
+    def __init__(self, index, path=None):
+        self.index = index
+        self.path = path
+        self.size = index.size()
+        self.flat = None  # списки документов плоскими массивами, см. arrays()
+        self.lock = threading.Lock()
+
+    def arrays(self):
+        """(id документов, термины, строка документа, номер термина и частота каждой пары) —
+        строятся один раз: сегмент не меняется"""
+        with self.lock:
+            if self.flat is None:
+                doc_ids = np.array(self.index.doc_ids(), dtype=np.int64)
+                terms = list(self.index.vocabulary())
+                ids, cols, freqs = [], [], []
+                for col, term in enumerate(terms):
+                    postings = self.index.postings(term)
+                    ids.extend(postings.ids)
+                    freqs.extend(postings.freqs)
+                    cols.extend([col] * len(postings))
+                rows = np.searchsorted(doc_ids, np.array(ids, dtype=np.int64))
+                self.flat = (doc_ids, terms, rows, np.array(cols, dtype=np.int64), np.array(freqs, dtype=np.float64))
+            return self.flat
+
+class CollectionStats:
+    """Статистика опубликованного набора сегментов, как у одного Index по всей коллекции:
+    df и IDF без удалённых документов, нормы документов по этим IDF и границы вклада терминов
+    для MaxScore. Считается один раз на опубликованный набор."""
+
+    def __init__(self, segments, deleted):
+        self.segments = segments
+        self.deleted = deleted
+        removed = np.array(sorted(deleted), dtype=np.int64)
+        flats = [segment.arrays() for segment in segments]
+        doc_freq = Counter()
+        N = 0
+        for doc_ids, terms, rows, cols, freqs in flats:
+            alive = ~np.isin(doc_ids, removed)
+            N += int(alive.sum())
+            counts = np.bincount(cols[alive[rows]], minlength=len(terms))
+            doc_freq.update(dict(zip(terms, counts.tolist())))
+        self.idf = {term: math.log(N / df) for term, df in doc_freq.items() if df}
+
+        self.norms = []  # по сегменту: документ -> норма вектора по общим IDF
+        for doc_ids, terms, rows, cols, freqs in flats:
+            idf = np.array([self.idf.get(term, 0) for term in terms], dtype=np.float64)
+            squares = np.bincount(rows, (freqs * idf[cols]) ** 2, minlength=len(doc_ids)) if len(rows) else \
+                np.zeros(len(doc_ids))
+            self.norms.append(dict(zip(doc_ids.tolist(), np.sqrt(squares).tolist())))
+        self.max_weights = [{} for _ in segments]  # по сегменту: термин -> max q * idf / |d|
+        self.lock = threading.Lock()
+
+    def query_stats(self, position, terms):
+        """IDF, нормы и границы вклада терминов запроса для сегмента номер position"""
+        segment, norms, bounds = self.segments[position], self.norms[position], self.max_weights[position]
+        with self.lock:
+            for term in terms:
+                if term not in bounds:
+                    # граница считается по спискам один раз на набор сегментов
+                    bounds[term] = max((q / norms[doc_id] for doc_id, q in segment.index.postings(term).items()
+                                        if norms[doc_id]), default=0) * self.idf.get(term, 0)
+        return ({term: self.idf.get(term, 0) for term in terms}, norms,
+                {term: bounds[term] for term in terms})
+
+class SegmentView:
+    """Сегмент для Search: списки документов — свои, IDF, нормы и границы вклада —
+    по всей коллекции, поэтому ранги разных сегментов сравнимы"""
+
+    positional = False
+    generation = 0
+    cache = None
+
+    def __init__(self, segment, idf, norms, max_weights):
+        self.segment = segment
+        self.idf = idf
+        self.norms = norms
+        self.max_weights = max_weights
+
+    def postings(self, term):
+        return self.segment.index.postings(term)
+
+    def get_idf(self, term):
+        return self.idf.get(term, 0)
+
+    def get_max_weight(self, term):
+        return self.max_weights.get(term, 0)
+
+    def get_norm(self, doc_id):
+        return self.norms[doc_id]
+
+    def get_document(self, doc_id):
+        return self.segment.index.get_document(doc_id)
+
+    def doc_ids(self):
+        return self.segment.index.doc_ids()
+
+_open_segments = {}  # путь: Segment, открытые в процессе поиска
+
+def search_segment(segment, query, k, stats, deleted):
+    """Top-k одного сегмента: (id документа, ранг, совпавшие термины).
+    segment — Segment или путь к файлу (в дочернем процессе файл открывается один раз);
+    stats — (IDF, нормы, границы вклада) по всей коллекции."""
+    if isinstance(segment, str):
+        path = segment
+        segment = _open_segments.get(path)
+        if segment is None:
+            if len(_open_segments) >= OPEN_SEGMENTS:
+                _open_segments.pop(next(iter(_open_segments)))
+            segment = _open_segments[path] = Segment(MappedIndex(path), path)
+    # удалённые документы отбрасываются после поиска, поэтому берём с запасом
+    results = Search(query, SegmentView(segment, *stats)).search(k + len(deleted))
+    return [(r.documentId, r.rank, r.matched_terms) for r in results if r.documentId not in deleted][:k]
+
+class SegmentedIndex:
+    """Индекс из сегментов (LSM): новые документы копятся в буфере в памяти, буфер становится
+    неизменяемым сегментом, фоновый поток записывает сегменты на диск и сливает соседние
+    сегменты одного яруса размера. Запрос выполняется по всем сегментам параллельно
+    с IDF и нормами по всей коллекции; ранги сливаются в общий top-k.
+    Загрузка и поиск не мешают друг другу: поиск видит только опубликованный кортеж сегментов."""
+
+    positional = False
+    duplicates = None
+
+    def __init__(self, folder=None, buffer_docs=BUFFER_DOCS, merge_factor=MERGE_FACTOR,
+                 workers=None, processes=False, compressed=False):
+        self.temporary = folder is None
+        self.folder = tempfile.mkdtemp(prefix="eyazis_segments_") if folder is None else folder
+        os.makedirs(self.folder, exist_ok=True)
+        self.buffer_docs = buffer_docs
+        self.merge_factor = merge_factor
+        self.compressed = compressed
+        self.buffer = Index()  # документы, ещё не видимые поиску
+        # опубликованное состояние, подменяется целиком под self.lock:
+        # (сегменты по возрастанию id документов, удалённые документы в этих сегментах)
+        self.published = ((), frozenset())
+        self.readers = {}  # путь: кол-во идущих поисков в процессах, которым нужен файл
+        self.retired = set()  # файлы слитых сегментов, ждущие, пока их перестанут читать
+        self.stats = None  # CollectionStats последнего опубликованного набора, с которым искали
+        self.stats_lock = threading.Lock()
+        self.manifest = {}  # для file_loader: путь к файлу — запись о загруженном документе
+        self.next_id = 0
+        self.segment_number = 0
+        self.lock = threading.Lock()  # изменения буфера и публикация сегментов
+        self.changed = threading.Condition(self.lock)
+        self.merge_lock = threading.Lock()  # запись и слияние сегментов — по одному
+        self.closed = False
+        self.error = None  # ошибка фонового потока
+        # процессы работают только с сегментами на диске, сегменты в памяти ищутся потоками
+        self.processes = ProcessPoolExecutor(workers) if processes else None
+        self.threads = ThreadPoolExecutor(workers or os.cpu_count() or 1)
+        self.merger = threading.Thread(target=self.merge_loop, daemon=True)
+        self.merger.start()
+
+    def close(self):
+        with self.lock:
+            self.closed = True
+            self.changed.notify_all()
+        self.merger.join()
+        self.threads.shutdown()
+        if self.processes is not None:
+            self.processes.shutdown()
+        with self.lock:
+            retired, self.retired = self.retired, set()
+        self.remove_files(retired)
+        if self.temporary:
+            shutil.rmtree(self.folder, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def segments(self):
+        return self.published[0]
+
+    @property
+    def deleted(self):
+        return self.published[1]
+
+    def size(self):
+        segments, deleted = self.published
+        return sum(segment.size for segment in segments) - len(deleted) + self.buffer.size()
+
+    # --- загрузка ---
+
+    def add_document(self, doc):
+        with self.lock:
+            self.buffer.add_document(doc)
+            self.next_id = max(self.next_id, doc.documentID + 1)
+            if self.buffer.size() >= self.buffer_docs:
+                self.refresh_locked()
+
+    def remove_document(self, doc_id):
+        """Удаление: из буфера сразу, в сегментах — пометкой до слияния"""
+        with self.lock:
+            if doc_id in self.buffer.documents:
+                self.buffer.remove_document(doc_id)
+            else:
+                segments, deleted = self.published
+                self.published = (segments, deleted | {doc_id})
+        return []
+
+    def refresh(self):
+        """Сделать загруженные документы видимыми поиску"""
+        with self.lock:
+            self.refresh_locked()
+
+    def refresh_locked(self):
+        if not self.buffer.size():
+            return
+        buffer, self.buffer = self.buffer, Index()
+        segments, deleted = self.published
+        self.published = (segments + (Segment(buffer),), deleted)
+        self.changed.notify_all()
+
+    def flush(self):
+        """refresh и ожидание, пока все сегменты окажутся на диске и слияния закончатся"""
+        with self.lock:
+            self.refresh_locked()
+            while self.error is None and not self.closed and self.pending_work():
+                self.changed.wait()
+            if self.error is not None:
+                raise self.error
+
+    def force_merge(self):
+        """Слияние всех сегментов в один (например, перед сохранением)"""
+        self.flush()
+        with self.merge_lock:
+            segments, deleted = self.published
+            if len(segments) > 1 or deleted:
+                self.merge(0, len(segments))
+
+    # --- фоновый поток ---
+
+    def new_path(self):
+        self.segment_number += 1
+        return os.path.join(self.folder, f"segment_{self.segment_number:06d}{SEGMENT_SUFFIX}")
+
+    def tier(self, segment):
+        # ярус: во сколько раз (по степеням merge_factor) сегмент больше буфера
+        if segment.size <= self.buffer_docs:
+            return 0
+        return int(math.log(segment.size / self.buffer_docs, self.merge_factor))
+
+    def merge_plan(self, segments):
+        """(начало, конец) первой группы из merge_factor соседних сегментов на диске одного яруса"""
+        for start in range(len(segments) - self.merge_factor + 1):
+            group = segments[start:start + self.merge_factor]
+            if all(segment.path is not None for segment in group) and len({self.tier(s) for s in group}) == 1:
+                return start, start + self.merge_factor
+        return None
+
+    def merge_loop(self):
+        while True:
+            with self.lock:
+                while not self.closed and not self.pending_work():
+                    self.changed.wait()
+                if self.closed:
+                    return
+            try:
+                with self.merge_lock:
+                    segments = self.segments
+                    for segment in segments:
+                        if segment.path is None:
+                            self.write_segment(segment)
+                            break
+                    else:
+                        plan = self.merge_plan(segments)
+                        if plan:
+                            self.merge(*plan)
+            except Exception as e:
+                # сегменты остаются в памяти и доступны поиску; ошибку получит flush()
+                with self.lock:
+                    self.error = e
+                    self.changed.notify_all()
+                return
+
+    def pending_work(self):
+        return any(segment.path is None for segment in self.segments) or self.merge_plan(self.segments)
+
+    def replace(self, old, new, dropped=frozenset()):
+        """Атомарная подмена сегментов old одним сегментом new; dropped — удалённые документы,
+        которых в new уже нет (сегменты и пометки меняются вместе, поиск не видит промежуточного)"""
+        with self.lock:
+            segments, deleted = self.published
+            start = segments.index(old[0])
+            self.published = (segments[:start] + (new,) + segments[start + len(old):], deleted - dropped)
+            self.changed.notify_all()
+            # файлы заменённых сегментов удаляются, когда их не читает ни один процесс поиска
+            retired = {segment.path for segment in old if segment.path is not None}
+            self.retired |= retired
+            return self.drain_retired()
+
+    def drain_retired(self):
+        """Вызывается под self.lock: файлы из retired, которые можно удалить сейчас"""
+        free = {path for path in self.retired if not self.readers.get(path)}
+        self.retired -= free
+        return free
+
+    @staticmethod
+    def remove_files(paths):
+        for path in paths:
+            try:
+                # открытые отображения (у идущих поисков в потоках) остаются действительными
+                os.remove(path)
+            except OSError:
+                pass
+
+    def write_segment(self, segment):
+        path = self.new_path()
+        save_index(path, segment.index, self.compressed)
+        self.replace([segment], Segment(MappedIndex(path), path))
+
+    def merge(self, start, end):
+        """Слияние соседних сегментов: списки документов склеиваются (диапазоны id не пересекаются),
+        удалённые документы выбрасываются, нормы пересчитываются по статистике нового сегмента"""
+        with self.lock:
+            segments, deleted = self.published
+            group = segments[start:end]
+        merged = Index()
+        for segment in group:
+            for doc_id in segment.index.doc_ids():
+                if doc_id not in deleted:
+                    merged.documents[doc_id] = segment.index.get_document(doc_id)
+        terms = heapq.merge(*(sorted(segment.index.vocabulary()) for segment in group))
+        previous = None
+        for term in terms:
+            if term == previous:
+                continue
+            previous = term
+            postings = None
+            for segment in group:
+                for doc_id, q in segment.index.postings(term).items():
+                    if doc_id not in deleted:
+                        if postings is None:
+                            postings = merged.postings_lists[merged.intern(term)]
+                        postings.ids.append(doc_id)
+                        postings.freqs.append(q)
+        path = self.new_path()
+        save_index(path, merged, self.compressed)
+        new = Segment(MappedIndex(path), path)
+        # удалённые документы слитых сегментов больше нигде не встречаются
+        dropped = {doc_id for segment in group for doc_id in segment.index.doc_ids()} & deleted
+        self.remove_files(self.replace(group, new, frozenset(dropped)))
+
+    # --- поиск ---
+
+    def collection_stats(self, segments, deleted):
+        """Общая статистика набора сегментов; пересчитывается, только когда набор изменился"""
+        with self.stats_lock:
+            stats = self.stats
+            if stats is None or stats.segments is not segments or stats.deleted is not deleted:
+                stats = self.stats = CollectionStats(segments, deleted)
+            return stats
+
+    def search(self, query, k=10):
+        """Top-k по всем сегментам: запрос выполняется в каждом сегменте параллельно"""
+        with self.lock:
+            segments, deleted = self.published
+            # файлы, которые откроют процессы поиска, не удаляются до конца запроса
+            paths = [segment.path for segment in segments
+                     if self.processes is not None and segment.path is not None]
+            for path in paths:
+                self.readers[path] = self.readers.get(path, 0) + 1
+        try:
+            if not segments:
+                return []
+            stats = self.collection_stats(segments, deleted)
+            terms = list(Search(query, SegmentView(segments[0], {}, {}, {})).query_weights)
+            futures = []
+            for position, segment in enumerate(segments):
+                segment_stats = stats.query_stats(position, terms)
+                if self.processes is not None and segment.path is not None:
+                    future = self.processes.submit(search_segment, segment.path, query, k, segment_stats, deleted)
+                else:
+                    future = self.threads.submit(search_segment, segment, query, k, segment_stats, deleted)
+                futures.append((segment, future))
+            found = []  # (ранг, сегмент, id документа, совпавшие термины)
+            for segment, future in futures:
+                found.extend((rank, segment, doc_id, matched) for doc_id, rank, matched in future.result())
+        finally:
+            with self.lock:
+                for path in paths:
+                    self.readers[path] -= 1
+                    if not self.readers[path]:
+                        del self.readers[path]
+                free = self.drain_retired()
+            self.remove_files(free)
+        best = heapq.nsmallest(k, found, key=lambda item: (-item[0], item[2]))
+        return [SearchResult(segment.index.get_document(doc_id), rank, list(matched), segment.index)
+                for rank, segment, doc_id, matched in best]
@@ -0,0 +1,251 @@
+"""HTTP-сервис поиска по индексу Lab_1 (только localhost).
+
+GET /search?q=...&k=10  — результаты поиска в JSON
+GET /doc/{id}           — документ целиком
+GET /similar/{id}?k=10  — похожие документы (LSH по подписям TF-IDF)
+GET /metrics            — QPS, гистограммы задержек и счётчики кеша запросов
+
+Пример: python server.py --folder tests --port 8080
+        python server.py --index index.eyzi
+"""
+import argparse
+import asyncio
+import bisect
+import json
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, unquote, urlsplit
+from file_loader import load_documents_from_folder
+from index import Index
+from index_file import MappedIndex
+from search import Search
+from similarity import SimilarityIndex
+
+HOST = "127.0.0.1"
+DEFAULT_K = 10
+MAX_K = 1000
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)  # верхние границы корзин
+QPS_WINDOW = 60  # секунд, за которые считается текущий QPS
+MAX_REQUEST_LINE = 8192
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 500: "Internal Server Error"}
+
+class Metrics:
+    """Счётчики запросов и гистограммы задержек по адресам"""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.requests = 0
+        self.recent = deque()  # моменты завершения запросов за последние QPS_WINDOW секунд
+        self.histograms = {}  # адрес: кол-во запросов по корзинам (последняя — больше всех границ)
+        self.totals = {}  # адрес: (кол-во, сумма задержек в мс)
+        self.statuses = {}
+
+    def observe(self, route, status, milliseconds):
+        now = time.monotonic()
+        self.requests += 1
+        self.recent.append(now)
+        while self.recent and self.recent[0] < now - QPS_WINDOW:
+            self.recent.popleft()
+        counts = self.histograms.setdefault(route, [0] * (len(LATENCY_BUCKETS_MS) + 1))
+        counts[bisect.bisect_left(LATENCY_BUCKETS_MS, milliseconds)] += 1
+        count, total = self.totals.get(route, (0, 0.0))
+        self.totals[route] = (count + 1, total + milliseconds)
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+
+    def report(self):
+        now = time.monotonic()
+        uptime = now - self.started
+        window = min(uptime, QPS_WINDOW)
+        recent = sum(1 for moment in self.recent if moment >= now - QPS_WINDOW)
+        routes = {}
+        for route, counts in self.histograms.items():
+            count, total = self.totals[route]
+            # накопительные корзины: сколько запросов уложилось в «le» миллисекунд
+            buckets, cumulative = [], 0
+            for bound, n in zip(list(LATENCY_BUCKETS_MS) + ["+Inf"], counts):
+                cumulative += n
+                buckets.append({"le": bound, "count": cumulative})
+            routes[route] = {"count": count, "mean_ms": total / count, "latency_ms": buckets}
+        return {
+            "uptime_seconds": uptime,
+            "requests": self.requests,
+            "qps": self.requests / uptime if uptime else 0.0,
+            "qps_recent": recent / window if window else 0.0,
+            "statuses": {str(status): n for status, n in sorted(self.statuses.items())},
+            "routes": routes,
+        }
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+class SearchServer:
+    """Асинхронный HTTP-сервер: соединения обслуживает цикл событий,
+    поиск и построение фрагментов выполняются в пуле потоков"""
+
+    def __init__(self, index, workers=4):
+        self.index = index
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.metrics = Metrics()
+        self.similarity = None  # строится при первом запросе /similar
+        self.similarity_lock = threading.Lock()
+
+    def run_search(self, query, k):
+        results = Search(query, self.index).search(k)
+        return [{
+            "id": r.documentId,
+            "title": r.title,
+            "rank": r.rank,
+            "matched_terms": r.matched_terms,
+            "snippet": r.snippet,
+        } for r in results]
+
+    def read_document(self, doc_id):
+        doc = self.index.get_document(doc_id)
+        return {"id": doc.documentID, "title": doc.title, "path": doc.path, "text": doc.text}
+
+    def find_similar(self, doc_id, k):
+        with self.similarity_lock:
+            if self.similarity is None:
+                self.similarity = SimilarityIndex(self.index)
+            similar = self.similarity.similar(doc_id, k)
+        return [{"id": other, "title": self.index.get_document(other).title, "similarity": score}
+                for other, score in similar]
+
+    @staticmethod
+    def parse_k(params):
+        try:
+            k = int(params.get("k", [DEFAULT_K])[0])
+        except ValueError:
+            raise HTTPError(400, "k must be an integer")
+        return max(1, min(k, MAX_K))
+
+    @staticmethod
+    def parse_doc_id(path, prefix):
+        try:
+            return int(unquote(path[len(prefix):]))
+        except ValueError:
+            raise HTTPError(400, "Document id must be an integer")
+
+    async def route(self, method, target):
+        """(адрес для метрик, статус, тело ответа) для запроса"""
+        url = urlsplit(target)
+        if method != "GET":
+            raise HTTPError(405, "Only GET is supported")
+        loop = asyncio.get_running_loop()
+        if url.path == "/search":
+            params = parse_qs(url.query)
+            query = params.get("q", [""])[0]
+            if not query.strip():
+                raise HTTPError(400, "Missing query parameter q")
+            k = self.parse_k(params)
+            start = time.perf_counter()
+            results = await loop.run_in_executor(self.executor, self.run_search, query, k)
+            took = (time.perf_counter() - start) * 1000
+            return "/search", 200, {"query": query, "k": k, "took_ms": took, "results": results}
+        if url.path.startswith("/doc/"):
+            doc_id = self.parse_doc_id(url.path, "/doc/")
+            try:
+                return "/doc", 200, await loop.run_in_executor(self.executor, self.read_document, doc_id)
+            except KeyError:
+                raise HTTPError(404, f"No document {doc_id}")
+        if url.path.startswith("/similar/"):
+            doc_id = self.parse_doc_id(url.path, "/similar/")
+            k = self.parse_k(parse_qs(url.query))
+            try:
+                similar = await loop.run_in_executor(self.executor, self.find_similar, doc_id, k)
+            except KeyError:
+                raise HTTPError(404, f"No document {doc_id}")
+            return "/similar", 200, {"id": doc_id, "k": k, "results": similar}
+        if url.path == "/metrics":
+            report = self.metrics.report()
+            cache = getattr(self.index, "cache", None)
+            if cache is not None:
+                report["query_cache"] = cache.stats()
+            return "/metrics", 200, report
+        raise HTTPError(404, f"Unknown path {url.path}")
+
+    async def handle(self, reader, writer):
+        """Одно соединение; поддерживается keep-alive"""
+        try:
+            while True:
+                try:
+                    request_line = await reader.readline()
+                except (ConnectionError, ValueError):
+                    return
+                if not request_line:
+                    return
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                start = time.perf_counter()
+                route = "other"
+                parts = request_line.decode("latin-1").split()
+                try:
+                    if len(parts) != 3 or len(request_line) > MAX_REQUEST_LINE:
+                        raise HTTPError(400, "Malformed request line")
+                    route, status, body = await self.route(parts[0], parts[1])
+                except HTTPError as e:
+                    status, body = e.status, {"error": str(e)}
+                except Exception as e:
+                    status, body = 500, {"error": str(e)}
+
+                keep_alive = headers.get("connection", "").lower() != "close" and parts[-1:] == ["HTTP/1.1"]
+                data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+                writer.write(
+                    f"HTTP/1.1 {status} {STATUS_TEXT[status]}\r\n"
+                    f"Content-Type: application/json; charset=utf-8\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + data
+                )
+                await writer.drain()
+                self.metrics.observe(route, status, (time.perf_counter() - start) * 1000)
+                if not keep_alive:
+                    return
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, port):
+        # слушаем только петлевой интерфейс: сервис не виден снаружи машины
+        server = await asyncio.start_server(self.handle, HOST, port, backlog=1024)
+        print(f"Serving {self.index.size()} documents on http://{HOST}:{port}")
+        async with server:
+            await server.serve_forever()
+
+def main():
+    parser = argparse.ArgumentParser(description="Local HTTP search service over the Lab_1 index")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--folder", help="folder of .txt documents to load")
+    source.add_argument("--index", help="index file written by save_index")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=4, help="threads for scoring")
+    parser.add_argument("--load-workers", type=int, default=1, help="processes for loading the folder")
+    parser.add_argument("--positional", action="store_true")
+    args = parser.parse_args()
+
+    if args.index:
+        index = MappedIndex(args.index)
+    else:
+        index = Index(positional=args.positional)
+        load_documents_from_folder(args.folder, args.load_workers, index)
+        index.update_norms()  # до первого запроса, а не в потоке поиска
+    server = SearchServer(index, args.workers)
+    try:
+        asyncio.run(server.serve(args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.executor.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+import heapq
+import multiprocessing
+import os
+from collections import Counter
+from document import Document
+from file_loader import read_document
+from index import Index
+from search import Search
+from spelling import SpellingIndex
+
+def shard_main(conn, positional=False):
+    """Цикл процесса-шарда: свой Index и ответы на команды родителя"""
+    index = Index(positional)
+    while True:
+        command, args = conn.recv()
+        if command == "load":
+            for doc_id, filepath in args:
+                _, text, term_freq, positions, offsets, _, first_hits = read_document(filepath, positional=positional)
+                doc = Document(doc_id, os.path.basename(filepath), text, filepath, term_freq, positions, offsets,
+                               first_hits)
+                doc.add_to_base(index)
+            conn.send(index.doc_freqs())
+        elif command == "stats":
+            index.set_global_stats(*args)
+            index.update_norms()
+            conn.send(None)
+        elif command == "search":
+            query, k, weights = args
+            conn.send(Search(query, index, weights).search(k))
+        elif command == "close":
+            conn.close()
+            return
+
+class ShardedIndex:
+    """Коллекция, разбитая по процессам: IDF считается по общей статистике,
+    запрос рассылается всем шардам, их top-k сливаются в общий.
+    Опечатки в запросе исправляются здесь по словарю всей коллекции:
+    шарды получают готовые веса терминов."""
+
+    def __init__(self, shards=None, positional=False, symspell=False):
+        self.shards = []
+        self.doc_count = 0
+        self.global_freq = Counter()  # термин: df во всей коллекции
+        self.folders = set()  # загруженные папки: манифеста у шардов нет, повторная загрузка запрещена
+        self.spelling = SpellingIndex(symspell)
+        for _ in range(shards or os.cpu_count() or 1):
+            parent_conn, child_conn = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=shard_main, args=(child_conn, positional), daemon=True)
+            process.start()
+            self.shards.append((process, parent_conn))
+
+    def close(self):
+        for process, conn in self.shards:
+            conn.send(("close", None))
+            process.join()
+        self.shards = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def broadcast(self, command, args_per_shard):
+        # сначала отправляем всем, потом ждём ответы — шарды работают параллельно
+        for (_, conn), args in zip(self.shards, args_per_shard):
+            conn.send((command, args))
+        return [conn.recv() for _, conn in self.shards]
+
+    def load_documents_from_folder(self, folder_path):
+        """Распределение .txt файлов папки по шардам (id документов — по порядку имён)"""
+        if not os.path.exists(folder_path):
+            raise FileNotFoundError(f"Folder not found: {folder_path}")
+        folder_path = os.path.abspath(folder_path)
+        if folder_path in self.folders:
+            raise ValueError(f"Folder already loaded: {folder_path}")
+        self.folders.add(folder_path)
+
+        filenames = sorted(name for name in os.listdir(folder_path) if name.endswith(".txt"))
+        parts = [[] for _ in self.shards]
+        for i, filename in enumerate(filenames):
+            parts[i % len(parts)].append((self.doc_count + i, os.path.join(folder_path, filename)))
+        self.doc_count += len(filenames)
+
+        # шарды присылают df по всем своим документам, а не только по новым: сумма считается заново
+        shard_freqs = self.broadcast("load", parts)
+        doc_freq = Counter()
+        for freqs in shard_freqs:
+            doc_freq.update(freqs)
+        for term in doc_freq.keys() - self.global_freq.keys():
+            self.spelling.add(term)
+        self.global_freq = doc_freq
+        # каждому шарду нужны общие df только его собственных терминов
+        self.broadcast("stats", [(self.doc_count, {term: doc_freq[term] for term in freqs}) for freqs in shard_freqs])
+        return len(filenames)
+
+    def doc_freq(self, term):
+        return self.global_freq.get(term, 0)
+
+    def suggest(self, term, limit=3):
+        """Как Index.suggest, но по словарю и df всей коллекции"""
+        found = self.spelling.lookup(term)
+        found.sort(key=lambda item: (item[1], -self.doc_freq(item[0]), item[0]))
+        return found[:limit]
+
+    def search(self, query, k=10):
+        weights = Search(query, self).query_weights
+        shard_results = self.broadcast("search", [(query, k, weights)] * len(self.shards))
+        merged = heapq.merge(*shard_results, key=lambda r: (-r.rank, r.documentId))
+        return list(merged)[:k] if k is not None else list(merged)
@@ -0,0 +1,157 @@
+import hashlib
+import numpy as np
+from scipy import sparse
+from index import default_index
+
+SIGNATURE_BITS = 256  # длина подписи документа
+# полос LSH x бит в полосе; чем уже полоса, тем менее похожие документы попадают в одну корзину
+SIMILAR_BANDS, SIMILAR_ROWS = 64, 4  # similar(): находит и умеренно похожие документы
+CLUSTER_BANDS, CLUSTER_ROWS = 16, 16  # cluster(): корзины только из очень похожих
+WORDS = SIGNATURE_BITS // 64
+PLANE_CHUNK = 4096  # терминов за один шаг построения подписей
+
+def term_signs(term):
+    """Компоненты случайных гиперплоскостей для термина: ±1, одинаковые в любом процессе"""
+    digest = hashlib.blake2b(term.encode("utf-8"), digest_size=SIGNATURE_BITS // 8).digest()
+    bits = np.unpackbits(np.frombuffer(digest, dtype=np.uint8))
+    return bits.astype(np.int8) * 2 - 1
+
+def popcount(words):
+    """Кол-во единичных бит в каждой строке массива uint64"""
+    return np.unpackbits(words.view(np.uint8), axis=-1).sum(axis=-1)
+
+class Bands:
+    """Полосы подписей: значение полосы — rows бит подряд; по каждой полосе
+    документы отсортированы по её значению, поиск полосы — бинарный"""
+
+    def __init__(self, bits, bands, rows):
+        if rows < 1 or rows > 64 or bands * rows > SIGNATURE_BITS:
+            raise ValueError(f"Cannot cut {bands} bands of {rows} bits from a {SIGNATURE_BITS}-bit signature")
+        self.count = bands
+        powers = np.uint64(1) << np.arange(rows, dtype=np.uint64)
+        grouped = bits[:, :bands * rows].reshape(len(bits), bands, rows).astype(np.uint64)
+        self.values = (grouped * powers).sum(axis=2, dtype=np.uint64)
+        self.order = np.argsort(self.values, axis=0, kind="stable")
+        self.keys = np.take_along_axis(self.values, self.order, axis=0)
+
+    def candidates(self, row):
+        """Строки документов, совпадающих с документом row хотя бы по одной полосе"""
+        found = []
+        for band in range(self.count):
+            keys = self.keys[:, band]
+            value = self.values[row, band]
+            start, end = np.searchsorted(keys, value, "left"), np.searchsorted(keys, value, "right")
+            found.append(self.order[start:end, band])
+        rows = np.unique(np.concatenate(found)) if found else np.array([], dtype=np.int64)
+        return rows[rows != row]
+
+    def buckets(self):
+        """Строки документов каждой корзины, где их больше одного (по возрастанию строки)"""
+        for band in range(self.count):
+            keys = self.keys[:, band]
+            order = self.order[:, band]
+            # границы корзин — места, где меняется значение полосы
+            bounds = np.flatnonzero(np.diff(keys)) + 1
+            starts = np.concatenate(([0], bounds))
+            ends = np.concatenate((bounds, [len(keys)]))
+            shared = ends - starts > 1
+            for start, end in zip(starts[shared], ends[shared]):
+                yield order[start:end]
+
+class SimilarityIndex:
+    """Похожие документы по подписям случайных гиперплоскостей (SimHash) их векторов TF-IDF.
+    Бит подписи — знак проекции вектора на гиперплоскость, поэтому доля различающихся бит
+    оценивает угол между векторами. Кандидаты ищутся по совпадающим полосам подписи:
+    для similar() полосы узкие (много кандидатов), для cluster() — широкие."""
+
+    def __init__(self, index=None, bands=SIMILAR_BANDS, rows=SIMILAR_ROWS,
+                 cluster_bands=CLUSTER_BANDS, cluster_rows=CLUSTER_ROWS):
+        self.index = index if index is not None else default_index
+        self.banding = (bands, rows)
+        self.cluster_banding = (cluster_bands, cluster_rows)
+        self.generation = None
+        self.build()
+
+    def build(self):
+        terms = list(self.index.vocabulary())
+        self.doc_ids = np.array(self.index.doc_ids(), dtype=np.int64)
+        rows, cols, weights = [], [], []
+        for j, term in enumerate(terms):
+            idf = self.index.get_idf(term)
+            postings = self.index.postings(term)
+            rows.extend(np.searchsorted(self.doc_ids, np.asarray(postings.ids, dtype=np.int64)).tolist())
+            cols.extend([j] * len(postings))
+            weights.extend(q * idf for _, q in postings.items())
+        # норма вектора на знак проекции не влияет, поэтому веса не нормируются
+        vectors = sparse.csr_matrix((np.array(weights, dtype=np.float64), (rows, cols)),
+                                    shape=(len(self.doc_ids), len(terms)))
+        projections = np.zeros((len(self.doc_ids), SIGNATURE_BITS))
+        for start in range(0, len(terms), PLANE_CHUNK):
+            # гиперплоскости строятся кусками по словарю, чтобы не держать матрицу словарь x биты целиком
+            chunk = terms[start:start + PLANE_CHUNK]
+            planes = np.array([term_signs(term) for term in chunk], dtype=np.float64)
+            projections += vectors[:, start:start + len(chunk)] @ planes
+        bits = projections > 0
+        # подпись — WORDS чисел uint64 на документ
+        self.signatures = np.packbits(bits, axis=1).view(np.uint64).reshape(len(self.doc_ids), WORDS)
+
+        self.bands = Bands(bits, *self.banding)
+        self.cluster_bands = Bands(bits, *self.cluster_banding)
+        self.generation = self.index.generation
+
+    def refresh(self):
+        if self.generation != self.index.generation:
+            self.build()
+
+    def row(self, doc_id):
+        row = int(np.searchsorted(self.doc_ids, doc_id))
+        if row == len(self.doc_ids) or self.doc_ids[row] != doc_id:
+            raise KeyError(doc_id)
+        return row
+
+    def candidates(self, row):
+        return self.bands.candidates(row)
+
+    def estimate(self, row, rows):
+        """Оценка косинуса между документами по доле различающихся бит подписей"""
+        distance = popcount(self.signatures[rows] ^ self.signatures[row])
+        return np.cos(np.pi * distance / SIGNATURE_BITS)
+
+    def similar(self, doc_id, k=10, threshold=0.0):
+        """До k документов, похожих на doc_id: пары (id документа, оценка косинуса)"""
+        self.refresh()
+        row = self.row(doc_id)
+        rows = self.candidates(row)
+        scores = self.estimate(row, rows)
+        keep = scores >= threshold
+        rows, scores = rows[keep], scores[keep]
+        order = np.lexsort((self.doc_ids[rows], -scores))[:k]
+        return [(int(self.doc_ids[rows[i]]), float(scores[i])) for i in order]
+
+    def cluster(self, threshold=0.8):
+        """Разбиение коллекции на группы похожих документов (списки id, крупные первыми).
+        Документы связываются, если они в одной корзине полосы и оценка косинуса не ниже threshold;
+        группы — компоненты связности."""
+        self.refresh()
+        parent = np.arange(len(self.doc_ids))
+
+        def find(row):
+            while parent[row] != row:
+                parent[row] = parent[parent[row]]
+                row = parent[row]
+            return row
+
+        for members in self.cluster_bands.buckets():
+            # каждый документ корзины сравниваем с первым, а не все пары
+            leader = members[0]
+            scores = self.estimate(leader, members[1:])
+            for row in members[1:][scores >= threshold]:
+                a, b = find(leader), find(row)
+                if a != b:
+                    parent[b] = a
+
+        roots = np.array([find(row) for row in range(len(self.doc_ids))], dtype=np.int64)
+        groups = {}
+        for row, root in enumerate(roots):
+            groups.setdefault(root, []).append(int(self.doc_ids[row]))
+        return sorted(groups.values(), key=lambda group: (-len(group), group[0]))
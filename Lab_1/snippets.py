@@ -0,0 +1,74 @@
+import re
+
+SNIPPET_LENGTH = 300  # длина фрагмента в символах
+
+def scan_hits(text, terms):
+    terms = set(terms)
+    return [match.span() for match in re.finditer(r"[a-z]+", text.lower()) if match.group() in terms]
+
+def find_hits(document, terms, index=None):
+    """Вхождения терминов запроса в документ: список (начало, конец) в тексте"""
+    if index is not None and getattr(index, "positional", False) and document.offsets is not None:
+        # по сохранённым позициям и смещениям токенов, без чтения текста
+        hits = []
+        for term in terms:
+            for position in index.positions(term, document.documentID):
+                start = document.offsets[position]
+                hits.append((start, start + len(term)))
+        return sorted(hits)
+    return scan_hits(document.text, terms)
+
+def first_hits(document, terms, index=None):
+    """Первые вхождения терминов по смещениям, сохранённым при загрузке, или None, если их нет"""
+    stored = getattr(document, "first_hits", None)
+    term_ids = getattr(index, "term_ids", None)
+    if stored is None or isinstance(stored, dict) or term_ids is None or document.term_ids is None:
+        return None
+    hits = []
+    for term in terms:
+        term_id = term_ids.get(term)
+        if term_id is None:
+            continue
+        try:
+            start = stored[document.term_ids.index(term_id)]
+        except ValueError:
+            continue
+        hits.append((start, start + len(term)))
+    return sorted(hits)
+
+def densest_window(hits, length=SNIPPET_LENGTH):
+    """Окно не длиннее length символов с наибольшим числом вхождений"""
+    best_count, best = 0, (0, 0)
+    first = 0
+    for last, (_, end) in enumerate(hits):
+        while end - hits[first][0] > length:
+            first += 1
+        if last - first + 1 > best_count:
+            best_count, best = last - first + 1, (hits[first][0], end)
+    return best
+
+def build_snippet(document, terms, index=None, length=SNIPPET_LENGTH):
+    """Фрагмент текста вокруг самого плотного скопления терминов запроса.
+    Возвращает текст и список (начало, конец) подсветки внутри него."""
+    hits = None if getattr(index, "positional", False) else first_hits(document, terms, index)
+    if hits:
+        # окно — по первым вхождениям; из текста читается и просматривается только фрагмент
+        window_start, window_end = densest_window(hits, length)
+        start = max(0, window_start - (length - (window_end - window_start)) // 2)
+        # по символу с каждой стороны — чтобы не подсветить слово, обрезанное краем фрагмента
+        lead = 1 if start else 0
+        around = document.read_text(start - lead, start + length + 1)
+        text = around[lead:lead + length]
+        highlights = [(a - lead, b - lead) for a, b in scan_hits(around, terms)
+                      if a >= lead and b <= lead + len(text)]
+        return text, highlights
+    hits = find_hits(document, terms, index)
+    if not hits:
+        return document.read_text(0, length), []
+    window_start, window_end = densest_window(hits, length)
+    # окно с вхождениями — по центру фрагмента
+    start = max(0, window_start - (length - (window_end - window_start)) // 2)
+    text = document.read_text(start, start + length)
+    end = start + len(text)
+    highlights = [(a - start, b - start) for a, b in hits if a >= start and b <= end]
+    return text, highlights
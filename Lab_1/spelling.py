@@ -0,0 +1,118 @@
+from collections import Counter
+
+MAX_DISTANCE = 2
+
+def max_distance(term):
+    """Допустимое число опечаток: в коротких словах меньше"""
+    if len(term) < 3:
+        return 0
+    return 1 if len(term) <= 5 else MAX_DISTANCE
+
+def trigrams(term):
+    padded = f"${term}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def deletions(term, distance):
+    """Все строки, получаемые из term удалением не более distance букв"""
+    result = frontier = {term}
+    for _ in range(distance):
+        frontier = {word[:i] + word[i + 1:] for word in frontier for i in range(len(word))}
+        result = result | frontier
+    return result
+
+def edit_distance(a, b, limit):
+    """Расстояние Дамерау–Левенштейна (перестановка соседних букв — одна правка).
+    Вычисление прекращается, как только расстояние превысило limit; тогда возвращается limit + 1."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    far = limit + 1  # клетки дальше limit от диагонали заведомо больше limit
+    before = None
+    previous = [j if j <= limit else far for j in range(len(b) + 1)]
+    for i in range(1, len(a) + 1):
+        current = [i if i <= limit else far] + [far] * len(b)
+        for j in range(max(1, i - limit), min(len(b), i + limit) + 1):
+            cost = previous[j - 1] + (a[i - 1] != b[j - 1])
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                cost = min(cost, before[j - 2] + 1)
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, cost, far)
+        if min(current) > limit:
+            return far
+        before, previous = previous, current
+    return previous[-1]
+
+class SpellingIndex:
+    """Поиск терминов словаря, близких к слову с опечаткой.
+    Триграммы отбирают кандидатов, расстояние редактирования проверяется только для них.
+    С deletions=True дополнительно хранится индекс удалений (SymSpell): быстрее, но больше памяти."""
+
+    def __init__(self, deletions=False):
+        self.trigram_terms = {}  # триграмма: термины с ней
+        self.deletion_terms = {} if deletions else None  # строка после удалений: термины
+        self.owned = None  # (таблица, ключ) множеств, не общих с копиями (None — все)
+
+    def copy(self):
+        """Копия, делящая множества с оригиналом до первого изменения (copy-on-write)"""
+        other = SpellingIndex()
+        other.trigram_terms = dict(self.trigram_terms)
+        other.deletion_terms = None if self.deletion_terms is None else dict(self.deletion_terms)
+        self.owned, other.owned = set(), set()
+        return other
+
+    def writable(self, table, key):
+        terms = table.get(key)
+        if terms is None:
+            terms = table[key] = set()
+        elif self.owned is not None and (table is self.trigram_terms, key) not in self.owned:
+            terms = table[key] = set(terms)
+        else:
+            return terms
+        if self.owned is not None:
+            self.owned.add((table is self.trigram_terms, key))
+        return terms
+
+    def add(self, term):
+        for gram in trigrams(term):
+            self.writable(self.trigram_terms, gram).add(term)
+        if self.deletion_terms is not None:
+            for variant in deletions(term, MAX_DISTANCE):
+                self.writable(self.deletion_terms, variant).add(term)
+
+    def discard(self, table, key, term):
+        terms = self.writable(table, key)
+        terms.discard(term)
+        if not terms:
+            del table[key]
+
+    def remove(self, term):
+        for gram in trigrams(term):
+            self.discard(self.trigram_terms, gram, term)
+        if self.deletion_terms is not None:
+            for variant in deletions(term, MAX_DISTANCE):
+                self.discard(self.deletion_terms, variant, term)
+
+    def candidates(self, term, distance):
+        if self.deletion_terms is not None:
+            # общая строка после удалений есть у любых двух слов на расстоянии <= distance
+            found = set()
+            for variant in deletions(term, distance):
+                found.update(self.deletion_terms.get(variant, ()))
+            return found
+        # одна правка меняет не больше 4 триграмм (перестановка — две соседние буквы)
+        grams = trigrams(term)
+        shared = Counter()
+        for gram in grams:
+            shared.update(self.trigram_terms.get(gram, ()))
+        need = max(1, len(grams) - 4 * distance)
+        return [candidate for candidate, count in shared.items() if count >= need]
+
+    def lookup(self, term):
+        """Пары (термин словаря, расстояние) не дальше допустимого для term"""
+        distance = max_distance(term)
+        if distance == 0:
+            return []
+        result = []
+        for candidate in self.candidates(term, distance):
+            d = edit_distance(term, candidate, distance)
+            if d <= distance:
+                result.append((candidate, d))
+        return result
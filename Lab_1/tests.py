@@ -1,6 +1,8 @@
 import os
+from batch_search import batch_search
+from evaluation import evaluate, format_table
+from index import default_index
 from file_loader import load_documents_from_folder
-from search import Search
 from metrics import precision, recall, f1_score, plot_metrics_for_queries
 
 # Папка с документами
@@ -35,12 +37,15 @@ def run_tests():
 
     results = {}
 
-    for query, relevant_docs in predefined_relevant_docs.items():
-        search = Search(query)
-        search_results = search.search()
-        retrieved_ids = set(r.documentId for r in search_results)
-        for r in  search_results:
-            print(f" ДОКУМЕНТЫ НАЙДЕНЫ: {r.title}")
+    # все запросы оцениваются одним пакетом
+    queries = list(predefined_relevant_docs)
+    all_results = batch_search(queries, k=None)
+
+    for query, search_results in zip(queries, all_results):
+        relevant_docs = predefined_relevant_docs[query]
+        retrieved_ids = set(doc_id for doc_id, _ in search_results)
+        for doc_id, _ in search_results:
+            print(f" ДОКУМЕНТЫ НАЙДЕНЫ: {default_index.documents[doc_id].title}")
 
         p = precision(relevant_docs, retrieved_ids)
         r = recall(relevant_docs, retrieved_ids)
@@ -53,6 +58,14 @@ def run_tests():
         print(f"Relevant: {relevant_docs}")
         print(f"Precision: {p:.2f}, Recall: {r:.2f}, F1: {f:.2f}\n")
 
+    # метрики ранжирования: номера запросов q1, q2, ... в формате TREC
+    qids = {f"q{n}": query for n, query in enumerate(queries, 1)}
+    run = {qid: [(str(doc_id), rank) for doc_id, rank in ranking]
+           for qid, ranking in zip(qids, all_results)}
+    qrels = {qid: {str(doc_id): 1 for doc_id in predefined_relevant_docs[query]}
+             for qid, query in qids.items()}
+    print(format_table(*evaluate(run, qrels, k=5), k=5))
+
     # Построение графиков для всех запросов
     plot_metrics_for_queries(results)
 
@@ -1,11 +1,81 @@
 import re
+import string
+from array import array
+from collections import Counter
 
 STOP_WORDS = {
     "the", "a", "an", "and", "or", "is", "are", "to", "of", "in", "on", "for", "with", "by"
 }
 
+TOKEN_PATTERN = re.compile(r"[a-z]+")
+CHUNK_SIZE = 1 << 20  # символов за одно чтение потока
+
 def tokenize(text: str):
     """Токенизация текста: нижний регистр + удаление стоп-слов"""
     text = text.lower()
     words = re.findall(r"[a-z]+", text)
     return [w for w in words if w not in STOP_WORDS]
+
+def tokenize_with_offsets(text: str):
+    """Токенизация как в tokenize + позиция начала каждого токена в тексте"""
+    tokens, offsets = [], array("I")
+    for match in re.finditer(r"[a-z]+", text.lower()):
+        if match.group() not in STOP_WORDS:
+            tokens.append(match.group())
+            offsets.append(match.start())
+    return tokens, offsets
+
+
+def iter_chunks(stream, chunk_size=CHUNK_SIZE):
+    """Текст потока в нижнем регистре кусками по chunk_size символов.
+    Слово на границе куска не разрывается: его начало переносится в следующий кусок."""
+    tail = ""
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        text = tail + chunk.lower()
+        cut = len(text.rstrip(string.ascii_lowercase))
+        tail = text[cut:]
+        yield text[:cut]
+    if tail:
+        yield tail
+
+def iter_tokens(stream, chunk_size=CHUNK_SIZE, first=None):
+    """Токены как в tokenize, но из потока: в памяти не больше одного куска.
+    first (dict) дополняется смещением первого вхождения каждого токена в тексте."""
+    base = 0
+    for text in iter_chunks(stream, chunk_size):
+        for match in TOKEN_PATTERN.finditer(text):
+            word = match.group()
+            if word not in STOP_WORDS:
+                if first is not None and word not in first:
+                    first[word] = base + match.start()
+                yield word
+        base += len(text)
+
+def count_tokens(stream, counts=None, chunk_size=CHUNK_SIZE, first=None):
+    """Частоты токенов потока; counts (Counter) дополняется на месте.
+    first (dict) дополняется смещением первого вхождения каждого токена в тексте."""
+    if counts is None:
+        counts = Counter()
+    base = 0
+    for text in iter_chunks(stream, chunk_size):
+        words = TOKEN_PATTERN.findall(text)
+        counts.update(words)
+        if first is not None:
+            new = set(words).difference(first)
+            # смещения ищем вторым проходом и только пока в куске есть новые слова
+            for match in TOKEN_PATTERN.finditer(text) if new else ():
+                if match.group() in new:
+                    first[match.group()] = base + match.start()
+                    new.discard(match.group())
+                    if not new:
+                        break
+        base += len(text)
+    # стоп-слова проще убрать один раз в конце, чем проверять каждое слово
+    for word in STOP_WORDS:
+        counts.pop(word, None)
+        if first is not None:
+            first.pop(word, None)
+    return counts
@@ -1,8 +1,15 @@
+import glob
 import json
+import os
 from collections import Counter
+import numpy as np
 
 N = 5
 TOP_K = 300
+PROFILE_SUFFIX = "_ngrams.json"
+
+# Код языка (начало имени файла профиля): название для вывода
+LANGUAGE_NAMES = {"fr": "French", "de": "German"}
 
 def get_ngrams(text):
     return [text[i:i+N] for i in range(len(text)-N+1)]
@@ -25,8 +32,59 @@ def oop_distance(lang_profile, text_profile):
         distance += abs(i - lang_profile.get(gram, max_penalty))
     return distance
 
-def detect_ngram(text, fr_profile, de_profile):
-    text_profile = list(build_profile([text]).keys())
-    fr_dist = oop_distance(fr_profile, text_profile)
-    de_dist = oop_distance(de_profile, text_profile)
-    return "French" if fr_dist < de_dist else "German"
+class ProfileRegistry:
+    """Профили всех языков в одной матрице рангов: строка — язык, столбец — номер N-граммы.
+    Расстояние текста до всех языков считается одним проходом NumPy (как oop_distance для каждого)."""
+
+    def __init__(self, folder=None):
+        self.languages = []  # коды языков в порядке строк матрицы
+        self.profiles = []  # профили «грамма → позиция» в том же порядке
+        self.gram_ids = {}  # N-грамма: номер столбца
+        self.ranks = None  # матрица рангов, строится при первом использовании
+        if folder is not None:
+            self.load(folder)
+
+    def load(self, folder):
+        """Загрузка всех profiles/*_ngrams.json; код языка — начало имени файла"""
+        for path in sorted(glob.glob(os.path.join(folder, "*" + PROFILE_SUFFIX))):
+            self.add(os.path.basename(path)[:-len(PROFILE_SUFFIX)], load_profile(path))
+
+    def add(self, language, profile):
+        self.languages.append(language)
+        self.profiles.append(profile)
+        for gram in profile:
+            self.gram_ids.setdefault(gram, len(self.gram_ids))
+        self.ranks = None
+
+    def build(self):
+        # отсутствующая в профиле грамма получает штраф — длину профиля
+        self.penalties = np.array([len(profile) for profile in self.profiles], dtype=np.int64)
+        self.ranks = np.repeat(self.penalties[:, None], len(self.gram_ids), axis=1)
+        for row, profile in enumerate(self.profiles):
+            columns = [self.gram_ids[gram] for gram in profile]
+            self.ranks[row, columns] = list(profile.values())
+
+    def distances(self, text_profile):
+        """Расстояния oop_distance от списка грамм текста до каждого языка"""
+        if self.ranks is None:
+            self.build()
+        positions = np.arange(len(text_profile))
+        known = np.array([gram in self.gram_ids for gram in text_profile], dtype=bool)
+        columns = np.array([self.gram_ids[gram] for gram in text_profile if gram in self.gram_ids], dtype=np.int64)
+        # граммы, которых нет ни в одном профиле, штрафуются во всех языках сразу
+        distance = np.abs(positions[known] - self.ranks[:, columns]).sum(axis=1)
+        distance += np.abs(positions[~known] - self.penalties[:, None]).sum(axis=1)
+        return distance
+
+    def detect(self, text):
+        text_profile = list(build_profile([text]).keys())
+        if not self.languages:
+            return "Unknown"
+        language = self.languages[int(np.argmin(self.distances(text_profile)))]
+        return LANGUAGE_NAMES.get(language, language)
+
+    def names(self):
+        return [LANGUAGE_NAMES.get(language, language) for language in self.languages]
+
+def detect_ngram(text, registry):
+    return registry.detect(text)
@@ -5,7 +5,7 @@ import threading
 
 from utils.html_parser import extract_text_from_html
 from detectors.alphabetic import detect_alphabetic
-from detectors.ngram import detect_ngram, load_profile
+from detectors.ngram import ProfileRegistry, detect_ngram
 from detectors.neural import detect_neural
 from utils.io import save_to_file
 
@@ -16,8 +16,8 @@ class LanguageDetectorApp(tk.Tk):
         self.title("Language Detector")
         self.geometry("900x500")
 
-        self.fr_profile = load_profile("profiles/fr_ngrams.json")
-        self.de_profile = load_profile("profiles/de_ngrams.json")
+        # все профили profiles/*_ngrams.json; новый язык — новый файл профиля
+        self.profiles = ProfileRegistry("profiles")
 
         self.results = []
 
@@ -50,7 +50,7 @@ class LanguageDetectorApp(tk.Tk):
             result = {
                 "file": os.path.basename(path),
                 "alphabetic": detect_alphabetic(text),
-                "ngram": detect_ngram(text, self.fr_profile, self.de_profile),
+                "ngram": detect_ngram(text, self.profiles),
                 "neural": "Processing..."
             }
 
@@ -100,6 +100,7 @@ class LanguageDetectorApp(tk.Tk):
         )
 
     def show_help(self):
+        languages = "".join(f"• {name}\n" for name in self.profiles.names())
         messagebox.showinfo(
             "Справка",
             "Назначение программы:\n"
@@ -110,6 +111,9 @@ class LanguageDetectorApp(tk.Tk):
             "• Французский\n"
             "• Немецкий\n\n"
 
+            "N-граммные профили:\n"
+            f"{languages}\n"
+
             "Используемые методы:\n"
             "1. Алфавитный — анализ национальных символов алфавита.\n"
             "2. N-граммный — сравнение частот символных 5-грамм.\n"
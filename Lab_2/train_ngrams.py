@@ -2,7 +2,7 @@ import os
 import json
 from collections import Counter
 from utils.html_parser import extract_text_from_html
-from .detectors.ngram import get_ngrams
+from detectors.ngram import PROFILE_SUFFIX, get_ngrams
 
 N = 5
 TOP_K = 300
@@ -32,18 +32,21 @@ def save_profile(profile, path):
 def main():
     print("Обучение N-граммных профилей...")
 
-    fr_profile = build_language_profile("data/train/fr")
-    de_profile = build_language_profile("data/train/de")
-
     os.makedirs("profiles", exist_ok=True)
 
-    save_profile(fr_profile, "profiles/fr_ngrams.json")
-    save_profile(de_profile, "profiles/de_ngrams.json")
+    # каждая папка data/train/<код языка> даёт профиль profiles/<код>_ngrams.json
+    paths = []
+    for language in sorted(os.listdir("data/train")):
+        folder = os.path.join("data/train", language)
+        if os.path.isdir(folder):
+            path = f"profiles/{language}{PROFILE_SUFFIX}"
+            save_profile(build_language_profile(folder), path)
+            paths.append(path)
 
     print("Готово!")
     print("Созданы файлы:")
-    print(" - profiles/fr_ngrams.json")
-    print(" - profiles/de_ngrams.json")
+    for path in paths:
+        print(f" - {path}")
 
 
 if __name__ == "__main__":